@@ -18,4 +18,7 @@ NUMBER_PIXELS = 15
 STATE_MACHINE = 0
 TEAM1LEDS = "1-2;3-5"
 TEAM2LEDS = "6-7;8-10"
-DEBUGMODE = 1
\ No newline at end of file
+DEBUGMODE = 1
+MAX_CLIENTS = 4
+CLIENT_BACKLOG = 2048
+CONFIG_BACKUPS = 3
\ No newline at end of file
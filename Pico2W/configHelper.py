@@ -16,9 +16,17 @@
 #OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
 #ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR 
 #OTHER DEALINGS IN THE SOFTWARE. 
+#v2.02 10/18/2026 Compiled schema, optional items, atomic writes with a backup ring
 #v2.01 12/30/2024 Default showLog to True
 #v2.00 11/30/2024 Add Toggle test type
 
+import binascii
+import hashlib
+import json
+import os
+
+SCHEMA_CACHE = "schemaCache.json"
+
 def loadRequired(filename='requiredConfigItems.py',showLog=True):
     success = True
     requiredConfigNames = []
@@ -28,6 +36,7 @@ def loadRequired(filename='requiredConfigItems.py',showLog=True):
     validSCLs = [[],[]]
     validI2Cs = []
     validStateMachines = []
+    optionalConfigNames = []
     try:
         # Open the config.py file for reading
         with open(filename, 'r') as config_file:
@@ -45,6 +54,9 @@ def loadRequired(filename='requiredConfigItems.py',showLog=True):
                 validSCLs[i] = [int(value) for value in values]
             validI2Cs = [int(i) for i in config_file.readline().strip().split(',')]
             validStateMachines = [int(i) for i in config_file.readline().strip().split(',')]
+            line = config_file.readline().strip()
+            if line and line[0] != '#':
+                optionalConfigNames = line.split(',')
     except OSError as e:
         if showLog:
             print("Error reading file " + filename + ":",e)
@@ -53,7 +65,7 @@ def loadRequired(filename='requiredConfigItems.py',showLog=True):
         if showLog:
             print("Invalid format in the " + filename + " file:",e)
         success = False
-    return (success,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines)
+    return (success,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,optionalConfigNames)
 
 def readConfigFile(filename,showLog=True):
     config = ""
@@ -68,14 +80,202 @@ def writeConfigFile(config,filename,showLog=True):
     if showLog:
         print(f"Config written to {filename}.")
 
-def validateConfig(config,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,showLog=True):
+def writeConfigData(data,filename,showLog=True):
+    with open(filename,"wb") as file:
+        file.write(data)
+    if showLog:
+        print(f"Config written to {filename}.")
+
+def replaceConfigFile(config,filename,backups=0,showLog=True):
+    # Written next to the target and renamed over it, so a power cut leaves
+    # either the old or the new file, never half of one. A copy of the old
+    # file becomes the newest of backups rotated copies, filename itself
+    # stays in place until the rename replaces it.
+    tempFile = f"{filename}.tmp"
+    if isinstance(config,(bytes,bytearray,memoryview)):
+        writeConfigData(config,tempFile,False)
+    else:
+        writeConfigFile(config,tempFile,False)
+    if backups > 0:
+        rotateBackups(filename,backups,showLog)
+    os.rename(tempFile,filename)
+    if showLog:
+        print(f"Config written to {filename}.")
+
+def backupFile(filename,index):
+    return f"{filename}.bak{index}"
+
+def copyFile(source,destination):
+    buffer = bytearray(256)
+    with open(source,"rb") as inFile, open(destination,"wb") as outFile:
+        while True:
+            count = inFile.readinto(buffer)
+            if not count:
+                break
+            outFile.write(memoryview(buffer)[:count])
+
+def fileExists(filename):
+    try:
+        os.stat(filename)
+        return True
+    except OSError:
+        return False
+
+def rotateBackups(filename,backups,showLog=True):
+    # filename.bak0 is the newest backup, anything past backups-1 is deleted.
+    # Only the backups that exist are looked at, whatever backups is.
+    count = 0
+    while fileExists(backupFile(filename,count)):
+        count += 1
+    for i in range(count - 1, backups - 2, -1):
+        os.remove(backupFile(filename,i))
+    for i in range(min(count,backups - 1), 0, -1):
+        os.rename(backupFile(filename,i - 1),backupFile(filename,i))
+    if fileExists(filename):
+        copyFile(filename,backupFile(filename,0))
+        if showLog:
+            print(f"Old config backed up as {backupFile(filename,0)}.")
+
+def restoreBackup(filename,schema,showLog=True):
+    # Put the newest backup that validates back in place of filename, the
+    # rejected file is kept as filename.bad.
+    index = 0
+    while fileExists(backupFile(filename,index)):
+        backup = backupFile(filename,index)
+        if validateConfig(readConfigFile(backup),schema,False):
+            if fileExists(filename):
+                copyFile(filename,f"{filename}.bad")
+            replaceConfigFile(readConfigFile(backup),filename,0,False)
+            if showLog:
+                print(f"Config restored from {backup}.")
+            return True
+        index += 1
+    return False
+
+def patchConfigArray(configArray,changes):
+    # Replace the values of the items in changes, keeping every other line
+    # as it is, and add the items the config does not have yet.
+    patched = []
+    remaining = dict(changes)
+    for item in configArray:
+        if not item.endswith("\n"):
+            item = f"{item}\n"
+        parts = item.split('=')
+        attribute = parts[0].strip()
+        if len(parts) == 2 and attribute in remaining:
+            patched.append(f"{attribute} = {remaining.pop(attribute)}\n")
+        else:
+            patched.append(item)
+    for attribute, value in remaining.items():
+        patched.append(f"{attribute} = {value}\n")
+    return patched
+
+def compileSchema(requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,optionalConfigNames=()):
+    # Lookups by name and value set so validation never searches a list.
+    return {"names": requiredConfigNames,
+            "optional": set(optionalConfigNames),
+            "tests": dict(zip(requiredConfigNames,requiredConfigTests)),
+            "pins": set(validPins),
+            "sdas": [set(sdas) for sdas in validSDAs],
+            "scls": [set(scls) for scls in validSCLs],
+            "i2cs": set(validI2Cs),
+            "sms": set(validStateMachines)}
+
+def fileHash(*filenames):
+    digest = hashlib.sha256()
+    for filename in filenames:
+        with open(filename,"rb") as file:
+            while True:
+                chunk = file.read(256)
+                if not chunk:
+                    break
+                digest.update(chunk)
+    return binascii.hexlify(digest.digest()).decode()
+
+def loadSchema(filename='requiredConfigItems.py',cacheFile=SCHEMA_CACHE,showLog=True):
+    # The compiled schema is kept in cacheFile with the hash of the files it
+    # came from and only rebuilt when one of them changes. This file is
+    # hashed too, so new validation rules also drop the cached verdict.
+    try:
+        sourceHash = fileHash(filename,__file__)
+    except OSError as e:
+        if showLog:
+            print("Error reading file " + filename + ":",e)
+        return (False,None)
+    try:
+        with open(cacheFile,"r") as file:
+            cache = json.load(file)
+        if cache["hash"] == sourceHash:
+            schema = compileSchema(cache["names"],cache["tests"],cache["pins"],cache["sdas"],cache["scls"],cache["i2cs"],cache["sms"],cache["optional"])
+            schema["hash"] = sourceHash
+            schema["validated"] = cache.get("validated")
+            return (True,schema)
+    except (OSError,ValueError,KeyError):
+        pass
+    success,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,optionalConfigNames = loadRequired(filename,showLog)
+    if not success:
+        return (False,None)
+    schema = compileSchema(requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,optionalConfigNames)
+    schema["hash"] = sourceHash
+    schema["validated"] = None
+    saveSchema(schema,cacheFile,showLog)
+    return (True,schema)
+
+def saveSchema(schema,cacheFile=SCHEMA_CACHE,showLog=True):
+    cache = {"hash": schema["hash"],
+             "validated": schema["validated"],
+             "names": schema["names"],
+             "tests": [schema["tests"][name] for name in schema["names"]],
+             "pins": list(schema["pins"]),
+             "sdas": [list(sdas) for sdas in schema["sdas"]],
+             "scls": [list(scls) for scls in schema["scls"]],
+             "i2cs": list(schema["i2cs"]),
+             "sms": list(schema["sms"]),
+             "optional": list(schema["optional"])}
+    try:
+        with open(cacheFile,"w") as file:
+            json.dump(cache,file)
+    except OSError as e:
+        if showLog:
+            print("Error writing file " + cacheFile + ":",e)
+
+def validateConfigFile(filename,schema,cacheFile=SCHEMA_CACHE,showLog=True):
+    # A config that already passed against this schema is not checked again.
+    try:
+        configHash = fileHash(filename)
+    except OSError as e:
+        if showLog:
+            print("Error reading file " + filename + ":",e)
+        return False
+    if schema["validated"] == configHash:
+        return True
+    if not validateConfig(readConfigFile(filename),schema,showLog):
+        return False
+    schema["validated"] = configHash
+    saveSchema(schema,cacheFile,showLog)
+    return True
+
+def validateConfig(config,schema,showLog=True):
     configArray = []
     for item in config:
         configArray.append(item)
-    return validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,showLog)
-def validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,showLog=True):
+    return validateConfigArray(configArray,schema,showLog)
+def validateConfigArray(configArray,schema,showLog=True):
+    validated, errors = configArrayErrors(configArray,schema)
+    if showLog:
+        for error in errors:
+            print(error)
+    return validated
+
+def configArrayErrors(configArray,schema):
     validated = True
     errors = []
+    tests = schema["tests"]
+    validPins = schema["pins"]
+    validSDAs = schema["sdas"]
+    validSCLs = schema["scls"]
+    validI2Cs = schema["i2cs"]
+    validStateMachines = schema["sms"]
     
     attributes = []
     values = []
@@ -89,10 +289,8 @@ def validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,vali
             attributes.append(attribute)
             values.append(value)
 
-            if attribute in requiredConfigNames:
-                pos = requiredConfigNames.index(attribute)
-                test = requiredConfigTests[pos]
-                
+            test = tests.get(attribute)
+            if test is not None:
                 if test == "PORT":
                     if not value.isdigit() or not (0 <= int(value) <= 65535):
                         errors.append(f"Error: {value} invalid for {attribute} in the config module.")
@@ -121,6 +319,18 @@ def validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,vali
                     if not value.isdigit() or int(value) < 0:
                         errors.append(f"Error: {value} invalid for {attribute} in the config module.")
                         validated = False
+                elif test == "CLIENTS":
+                    if not value.isdigit() or not (1 <= int(value) <= 8):
+                        errors.append(f"Error: {value} invalid for {attribute} in the config module.")
+                        validated = False
+                elif test == "BACKLOG":
+                    if not value.isdigit() or not (2048 <= int(value) <= 8192):
+                        errors.append(f"Error: {value} invalid for {attribute} in the config module.")
+                        validated = False
+                elif test == "BACKUPS":
+                    if not value.isdigit() or not (1 <= int(value) <= 10):
+                        errors.append(f"Error: {value} invalid for {attribute} in the config module.")
+                        validated = False
                 elif test == "SM":
                     if not value.isdigit() or int(value) not in validStateMachines:
                         errors.append(f"Error: {value} invalid for {attribute} in the config module.")
@@ -128,12 +338,12 @@ def validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,vali
                 elif test == "LEDS":
                     led_ranges = value.replace('"','').split(";")
                     for led_range in led_ranges:
-                        start, end = led_range.split("-")
-                        if not start.isdigit() or not end.isdigit():
+                        bounds = led_range.split("-")
+                        if len(bounds) != 2 or not bounds[0].isdigit() or not bounds[1].isdigit():
                             errors.append(f"Error: {value} invalid for {attribute} in the config module.")
                             validated = False
                             break
-                        start, end = int(start), int(end)
+                        start, end = int(bounds[0]), int(bounds[1])
                         if not (0 <= start <= end <= 500):
                             errors.append(f"Error: {value} invalid for {attribute} in the config module.")
                             validated = False
@@ -146,17 +356,21 @@ def validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,vali
                 errors.append(f"Error: Unknown attribute {attribute} in the config module.")
                 validated = False
 
-    missing_items = [item for item in requiredConfigNames if item not in attributes]
+    # A missing item would stop the program at start up, only optional
+    # items, which have defaults, may be left out.
+    present = set(attributes)
+    missing_items = [item for item in schema["names"] if item not in present and item not in schema["optional"]]
     if missing_items:
+        validated = False
         for item_name in missing_items:
             errors.append(f"Error: {item_name} is missing from the config module.")
 
     # Check for duplicate attribute values with the same test
     attribute_value_map = {}
-    skip_tests = {"TIME","LEDS"}
+    skip_tests = {"TIME","LEDS","INT","CLIENTS","BACKLOG","BACKUPS"}
     for attribute, value in zip(attributes, values):
-        if attribute in requiredConfigNames:
-            test = requiredConfigTests[requiredConfigNames.index(attribute)]
+        test = tests.get(attribute)
+        if test is not None:
             if test in skip_tests:
                 continue
             key = (test, value)
@@ -170,8 +384,36 @@ def validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,vali
             attributes_str = ", ".join(attributes)
             errors.append(f"Error: Duplicated value '{value}' found in attributes: {attributes_str}.")
 
-    for error in errors:
-        if showLog:
-            print(error)
+    return (validated,errors)
 
-    return validated
+def configValues(configArray):
+    values = {}
+    for item in configArray:
+        parts = item.strip().split('=')
+        if len(parts) == 2:
+            values[parts[0].strip()] = parts[1].strip()
+    return values
+
+def configConsistencyErrors(configArray,schema):
+    # Checks across items that validateConfigArray looks at one by one.
+    errors = []
+    values = configValues(configArray)
+    bus = values.get("I2C","")
+    if bus.isdigit() and int(bus) < len(schema["sdas"]):
+        bus = int(bus)
+        sda = values.get("SDA","")
+        if sda.isdigit() and int(sda) not in schema["sdas"][bus]:
+            errors.append(f"Error: SDA {sda} is not an SDA pin of I2C {bus}.")
+        scl = values.get("SCL","")
+        if scl.isdigit() and int(scl) not in schema["scls"][bus]:
+            errors.append(f"Error: SCL {scl} is not an SCL pin of I2C {bus}.")
+    pixels = values.get("NUMBER_PIXELS","")
+    if pixels.isdigit():
+        for attribute, value in values.items():
+            if schema["tests"].get(attribute) != "LEDS":
+                continue
+            for led_range in value.replace('"','').split(";"):
+                end = led_range.split("-")[-1].strip()
+                if end.isdigit() and int(end) >= int(pixels):
+                    errors.append(f"Error: {attribute} range {led_range} is past the last pixel of NUMBER_PIXELS {pixels}.")
+    return errors
@@ -30,20 +30,23 @@
 import network
 import secretsHP
 import secretsHome
-import config
 import configHelper
 import time
 import sys
-import socket
-import select
+import asyncio
 import _thread
+import gc
 from pico_i2c_lcd import I2cLcd
 import machine
+import micropython
 from machine import Pin
 from machine import Timer
 from machine import I2C
 from neopixel import Neopixel
-from collections import deque
+import array
+import struct
+import binascii
+import os
 
 isHome = True
 TEAM1 = 0
@@ -63,6 +66,7 @@ minBallsInRack = 1
 rackMode = "On"
 tourneyMode = "Off"
 changeValueMode = False
+action = ""
 allLEDs = []
 skipNetwork = 0
 # Color RGB values
@@ -79,6 +83,21 @@ orange = (255, 50, 0)
 indigo = (100, 0, 90)
 violet = (200, 0, 100)
 colors_rgb = [red, orange, yellow, green, blue, indigo, violet]
+# LED strip commands. Their index is what travels through the command ring,
+# unknown commands run the chase pattern.
+ledCommands = ("blink", "solid", "fade", "clear", "score", "timeout", "test", "rainbowchase", "chase")
+ledCommandIds = {name: i for i, name in enumerate(ledCommands)}
+CMD_CHASE = ledCommandIds["chase"]
+CMD_SOLID = ledCommandIds["solid"]
+CMD_CLEAR = ledCommandIds["clear"]
+CMD_RAINBOWCHASE = ledCommandIds["rainbowchase"]
+CMD_NONE = 0xff
+# LED strip effect priorities. A queued command takes over the running effect
+# when its priority is higher, so goal feedback does not wait for idle effects.
+PRIORITY_IDLE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_ALERT = 2
+ledCommandPriority = {"rainbowchase": PRIORITY_IDLE, "score": PRIORITY_ALERT, "timeout": PRIORITY_ALERT}
 
 def debug(message, *args, level="INFO", exc=None, multiLine=False):
     """
@@ -124,14 +143,71 @@ class LEDStrip:
         debug("state_machine: {}",state_machine,level="DEBUG")
         debug("rgb_mode: {}",rgb_mode,level="DEBUG")
         self.num_pixels = num_pixels
+        self.rgb_mode = rgb_mode
         self.strip = Neopixel(num_pixels, state_machine, pin, rgb_mode)
-        self.command_maxlen = 10
-        self.command = deque((),self.command_maxlen)
-        self.command_lock = None
+        # (pin, num_pixels, state_machine) waiting to be swapped in by core 1
+        self.new_strip = None
+        self.frame_ms = 20
+        self.priorities = bytes([ledCommandPriority.get(name, PRIORITY_NORMAL) for name in ledCommands])
+        # Ranges are registered up front, commands only carry their index.
+        # range_keys are the caller's lists, looked up by identity on core 0,
+        # range_sets are core 1's own copies of them.
+        self.range_keys = []
+        self.range_sets = []
+        # Replacement for range_sets waiting to be swapped in by core 1
+        self.new_range_sets = None
+        # Single producer (main loop) / single consumer (core 1) command ring.
+        # Only send_command moves head and only the control loop moves tail,
+        # so neither side needs a lock. One slot is kept free to tell full from empty.
+        self.ring_size = 16
+        self.ring_command = bytearray(self.ring_size)
+        self.ring_range = bytearray(self.ring_size)
+        self.ring_duration = array.array("f", [0] * self.ring_size)
+        self.ring_color = array.array("I", [0] * self.ring_size)
+        self.head = 0
+        self.tail = 0
+        self.coalesced_head = 0
+        # Commands dropped on a full ring and commands merged into a later one
+        self.dropped = 0
+        self.merged = 0
+        # Held while the control loop is idle, released by send_command to wake it
+        self.wake = _thread.allocate_lock()
+        self.wake.acquire()
+
+    def add_ranges(self, ranges):
+        """
+        Register a set of led ranges so commands can refer to it.
+        Must be called before initialize().
+        :param ranges: One or more ranges of led pixels (e.g., ((1,5),(7,12)...)
+        :return: index of the registered ranges
+        """
+        for i in range(len(self.range_keys)):
+            if self.range_keys[i] is ranges:
+                return i
+        self.range_keys.append(ranges)
+        self.range_sets.append(tuple(ranges))
+        return len(self.range_keys) - 1
+
+    def set_ranges(self, ranges, new_ranges):
+        """
+        Change the pixels of a registered set of ranges. Core 1 swaps the new
+        ranges in between frames, it never sees a list core 0 is changing.
+        :param ranges: Ranges registered with add_ranges, still used to refer to the set.
+        :param new_ranges: The led ranges the set covers from now on.
+        """
+        for i in range(len(self.range_keys)):
+            if self.range_keys[i] is ranges:
+                # Built from the newest sets, including ones not swapped in yet
+                sets = self.new_range_sets
+                if sets is None:
+                    sets = self.range_sets
+                sets = list(sets)
+                sets[i] = tuple(new_ranges)
+                self.new_range_sets = sets
+                return
 
     def initialize(self):
         debug("initializing thread...", level="DEBUG")
-        self.command_lock = _thread.allocate_lock()
         # Start the LED control thread on Core 1
         debug("launching thread: {}", id(self), level="DEBUG")
         _thread.start_new_thread(self._led_control_loop, ())
@@ -139,137 +215,722 @@ class LEDStrip:
 
     def send_command(self, command="blink", ranges=allLEDs, duration=1, color=red):
         """
-        Send a command to the LED strip.
+        Send a command to the LED strip. Nothing is allocated on this path.
         :param command: The pattern to display (e.g., 'blink', 'fade').
-        :param ranges: One or more ranges of led pixels (e.g., ((1,5),(7,12)...)
+        :param ranges: One or more ranges of led pixels registered with add_ranges.
         :param duration: Duration for the pattern in seconds.
+        :param color: (r, g, b) color for patterns that use one.
+        :return: True if the command was queued.
         """
-        debug("send_command: {}, ranges: {}, duration: {}, color: {}",command,ranges,duration,color,level="DEBUG")
-        self.command_lock.acquire()
-        try:
-            if len(self.command) < self.command_maxlen:
-                self.command.append((command, ranges, duration, color))
-            else:
-                debug("Command queue full!  Dropping command: {}",command, level="WARNING")
-        finally:
-            self.command_lock.release()
+        range_id = -1
+        for i in range(len(self.range_keys)):
+            if self.range_keys[i] is ranges:
+                range_id = i
+                break
+        head = self.head
+        next_head = head + 1
+        if next_head == self.ring_size:
+            next_head = 0
+        if range_id < 0 or next_head == self.tail:
+            self.dropped += 1
+            debug("Command queue full or ranges not registered!  Dropping command: {}",command, level="WARNING")
+            return False
+        self.ring_command[head] = ledCommandIds.get(command, CMD_CHASE)
+        self.ring_range[head] = range_id
+        self.ring_duration[head] = duration
+        self.ring_color[head] = color[0] << 16 | color[1] << 8 | color[2]
+        # Publish the slot only once it is complete
+        self.head = next_head
+        if self.wake.locked():
+            self.wake.release()
+        return True
+
+    def reconfigure(self, pin, num_pixels, state_machine):
+        """
+        Move to a strip on another pin, state machine or with another length.
+        The control loop swaps it in between frames, so the old strip is never
+        driven from both cores. The running effect is dropped.
+        :param pin: Data pin of the strip.
+        :param num_pixels: Number of pixels on the strip.
+        :param state_machine: PIO state machine driving the strip.
+        """
+        self.new_strip = (pin, num_pixels, state_machine)
+        if self.wake.locked():
+            self.wake.release()
+
+    def stats(self):
+        """
+        Report how the command queue has been coping.
+        :return: (merged, dropped) command counts since start up.
+        """
+        return self.merged, self.dropped
 
     def _led_control_loop(self):
-        """Core 1 thread loop to control the LED strip."""
+        """
+        Core 1 thread loop to control the LED strip.
+        Every effect is a generator that draws one frame per step and yields the
+        number of milliseconds until its next frame. The loop ticks at least every frame_ms,
+        so a queued command with a higher priority takes over within one frame.
+        With nothing to draw it blocks on the wake lock until send_command is called.
+        """
         debug("led control loop thread running",level="DEBUG")
-        debug("Using lock from", id(self),level="DEBUG")
-        debug("command_lock is:", self.command_lock,level="DEBUG")
+        effect = None
+        priority = PRIORITY_IDLE
+        next_frame = time.ticks_ms()
         while True:
-            cmd = None
-            self.command_lock.acquire()
-            try:
-                if self.command:
-                    cmd = self.command.popleft()
-            finally:
-                self.command_lock.release()
-            if cmd:
-                command, ranges, duration, color = cmd
-                self._execute_command(command, ranges, duration, color)
+            if self.new_strip is not None:
+                effect = None
+                priority = PRIORITY_IDLE
+                self._swap_strip()
+            if self.new_range_sets is not None:
+                # A running effect keeps the ranges it started with
+                self.range_sets = self.new_range_sets
+                self.new_range_sets = None
+            if self.head != self.coalesced_head:
+                self._coalesce()
+            if effect is None:
+                slot = self._next_slot()
+                if slot < 0:
+                    self.wake.acquire()
+                    continue
             else:
-                # No command available, sleep a little bit
-                time.sleep(0.1)
+                slot = self._preempting_slot(priority)
+                if slot >= 0:
+                    debug("LED effect preempted by {}",ledCommands[self.ring_command[slot]],level="DEBUG")
+            if slot >= 0:
+                command = self.ring_command[slot]
+                ranges = self.range_sets[self.ring_range[slot]]
+                duration = self.ring_duration[slot]
+                packed = self.ring_color[slot]
+                color = (packed >> 16 & 0xff, packed >> 8 & 0xff, packed & 0xff)
+                # Free the slot, commands taken out of order leave a tombstone
+                self.ring_command[slot] = CMD_NONE
+                self._next_slot()
+                debug("LED command: {}",ledCommands[command],level="DEBUG")
+                effect = self._start_effect(ledCommands[command], ranges, duration, color)
+                priority = self.priorities[command]
+                next_frame = time.ticks_ms()
+            if effect is not None and time.ticks_diff(time.ticks_ms(), next_frame) >= 0:
+                try:
+                    next_frame = time.ticks_add(time.ticks_ms(), next(effect))
+                except StopIteration:
+                    effect = None
+                    # Start the next pending command without waiting for a tick
+                    continue
+            # Wake for the effect's next frame if that comes before the next
+            # tick, so frame times are not rounded up to a multiple of frame_ms.
+            wait = self.frame_ms
+            if effect is not None:
+                wait = min(wait, time.ticks_diff(next_frame, time.ticks_ms()))
+            if wait > 0:
+                time.sleep_ms(wait)
+
+    def _swap_strip(self):
+        pin, num_pixels, state_machine = self.new_strip
+        self.new_strip = None
+        debug("LED strip now pin: {} pixels: {} state machine: {}",pin,num_pixels,state_machine,level="INFO")
+        self._clear_strip()
+        self.strip.sm.active(0)
+        self.strip = Neopixel(num_pixels, state_machine, pin, self.rgb_mode)
+        self.num_pixels = num_pixels
+        self._clear_strip()
+
+    def _next_slot(self):
+        # Skip tombstones at the tail and return the oldest live slot, or -1
+        tail = self.tail
+        while tail != self.head and self.ring_command[tail] == CMD_NONE:
+            tail += 1
+            if tail == self.ring_size:
+                tail = 0
+        self.tail = tail
+        if tail == self.head:
+            return -1
+        return tail
+
+    def _coalesce(self):
+        # Tombstone queued commands that a later queued command makes redundant,
+        # so the strip converges on the latest state instead of replaying a backlog.
+        head = self.head
+        merged = self.merged
+        prev = -1
+        i = self.tail
+        while i != head:
+            command = self.ring_command[i]
+            if command != CMD_NONE:
+                if prev >= 0 and self._supersedes(prev, i):
+                    self.ring_command[prev] = CMD_NONE
+                    self.merged += 1
+                if self.priorities[command] == PRIORITY_ALERT:
+                    # A goal or time out makes any pending rainbowchase stale
+                    j = self.tail
+                    while j != i:
+                        if self.ring_command[j] == CMD_RAINBOWCHASE:
+                            self.ring_command[j] = CMD_NONE
+                            self.merged += 1
+                        j += 1
+                        if j == self.ring_size:
+                            j = 0
+                prev = i
+            i += 1
+            if i == self.ring_size:
+                i = 0
+        self.coalesced_head = head
+        if self.merged != merged:
+            debug("LED queue merged: {} dropped: {}",self.merged,self.dropped,level="DEBUG")
+
+    def _supersedes(self, earlier, later):
+        # True when the command in slot later makes the one in slot earlier redundant
+        first = self.ring_command[earlier]
+        second = self.ring_command[later]
+        if second == CMD_CLEAR:
+            return first == CMD_CLEAR or first == CMD_SOLID
+        if first == CMD_SOLID and second == CMD_SOLID:
+            return (self.ring_range[earlier] == self.ring_range[later] and
+                    self.ring_color[earlier] == self.ring_color[later])
+        return first == CMD_RAINBOWCHASE and second == CMD_RAINBOWCHASE
+
+    def _preempting_slot(self, priority):
+        # First queued command that interrupts an effect of the given priority.
+        # Higher priorities interrupt the running effect, and an alert
+        # (score, timeout) always replaces the alert before it.
+        head = self.head
+        i = self.tail
+        while i != head:
+            command = self.ring_command[i]
+            if command != CMD_NONE:
+                new_priority = self.priorities[command]
+                if new_priority > priority or new_priority == PRIORITY_ALERT:
+                    return i
+            i += 1
+            if i == self.ring_size:
+                i = 0
+        return -1
 
     def _set_color(self, ranges, color):
-        # Iterate over the specified ranges
+        # Iterate over the specified ranges, the color is packed once per range
         for start, end in ranges:
-            # Set the color for each LED within the range
-            for i in range(start, end + 1):
-                self.strip[i] = color
+            self.strip.set_pixel_line(start, end, color)
 
     def _clear_strip(self):
         """Turn off all LEDs."""
-        for i in range(self.num_pixels):
-            self.strip[i] = off
+        self.strip.fill(off)
         self.strip.show()
-        
-    def _execute_command(self, command, ranges, duration, color):
+
+    def _start_effect(self, command, ranges, duration, color):
         """
-        Execute the given LED pattern.
-        :param pattern: The pattern to display.
-        :param duration: Duration for the pattern in seconds.
+        Create the frame generator for the given LED pattern.
+        :param command: The pattern to display.
+        :param ranges: One or more ranges of led pixels.
+        :param duration: Duration for the pattern, its unit depends on the pattern.
+        :param color: Color for patterns that use one.
         """
         if command == "blink":
-            for _ in range(duration * 2):  # Blink for duration seconds
-                self._set_color(ranges, color)
-                self.strip.show()
-                time.sleep(0.5)
-                self._clear_strip()
-                time.sleep(0.5)
+            return self._blink(ranges, duration, color)
         elif command == "solid":
-            self._set_color(ranges, color)
-            self.strip.show()
+            return self._solid(ranges, color)
         elif command == "fade":
-            for brightness in range(0, 256, 5):  # Fade in
-                for i in range(self.num_pixels):
-                    self.strip[i] = (brightness, brightness, brightness)
-                self.strip.show()
-                time.sleep(0.05)
-            for brightness in range(255, -1, -5):  # Fade out
-                for i in range(self.num_pixels):
-                    self.strip[i] = (brightness, brightness, brightness)
-                self.strip.show()
-                time.sleep(0.05)
+            return self._fade()
         elif command == "clear":
-            self._clear_strip()
+            return self._clear()
         elif command == "score":
-            for _ in range(3):
-                self._set_color(ranges, green)
-                self.strip.show()
-                time.sleep(duration)
-                self._set_color(ranges, red)
-                self.strip.show()
-                time.sleep(duration)
-            self._clear_strip()
+            return self._score(ranges, duration)
         elif command == "timeout":
-            debug("executing timeout command - red",level="DEBUG")
-            self._set_color(ranges, red)
-            self.strip.show()
-            time.sleep(duration*.666/1000)
-            debug("executing timeout command - green",level="DEBUG")
-            self._set_color(ranges, green)
-            self.strip.show()
-            time.sleep(duration*.334/1000)
-            debug("executing timeout command - clear",level="DEBUG")
-            self._clear_strip()
+            return self._timeout(ranges, duration)
         elif command == "test":
-            for i in range(0, NUMBER_PIXELS):
-                self.strip.set_pixel(i, red)
-                if i > 0: self.strip.set_pixel(i-1, off)
-                if i == 0: self.strip.set_pixel(NUMBER_PIXELS-1, off)
-                self.strip.show()
-                time.sleep(duration)
-            for x in range(0,NUMBER_PIXELS):
-                i = NUMBER_PIXELS - x
-                self.strip.set_pixel(i-1, green)
-                if i < NUMBER_PIXELS: self.strip.set_pixel(i, off)
-                if i == NUMBER_PIXELS: self.strip.set_pixel(NUMBER_PIXELS-1, off)
-                self.strip.show()
-                time.sleep(duration)
-            self._clear_strip()
+            return self._test(duration)
         elif command == "rainbowchase":
-            step = round(self.num_pixels / len(colors_rgb))
-            current_pixel = 0
-            self.strip.brightness(50)
-            for color1, color2 in zip(colors_rgb, colors_rgb[1:]):
-                self.strip.set_pixel_line_gradient(current_pixel, current_pixel + step, color1, color2)
-                current_pixel += step
-            self.strip.set_pixel_line_gradient(current_pixel, self.num_pixels - 1, violet, red)
-            for _ in range(duration):
-                self.strip.rotate_right(1)
-                time.sleep(0.042)
-                self.strip.show()
-            self._clear_strip()
+            return self._rainbowchase(duration)
         else:
-            for i in range(0, NUMBER_PIXELS):
-                self.strip.set_pixel(i,red)
-                self.strip.show()
-                time.sleep(.1)
+            return self._chase()
+
+    def _blink(self, ranges, duration, color):
+        for _ in range(int(duration * 2)):  # Blink for duration seconds
+            self._set_color(ranges, color)
+            self.strip.show()
+            yield 500
             self._clear_strip()
+            yield 500
+
+    def _solid(self, ranges, color):
+        self._set_color(ranges, color)
+        self.strip.show()
+        yield 0
+
+    def _fade(self):
+        for brightness in range(0, 256, 5):  # Fade in
+            self.strip.fill((brightness, brightness, brightness))
+            self.strip.show()
+            yield 50
+        for brightness in range(255, -1, -5):  # Fade out
+            self.strip.fill((brightness, brightness, brightness))
+            self.strip.show()
+            yield 50
+
+    def _clear(self):
+        self._clear_strip()
+        yield 0
+
+    def _score(self, ranges, duration):
+        for _ in range(3):
+            self._set_color(ranges, green)
+            self.strip.show()
+            yield int(duration * 1000)
+            self._set_color(ranges, red)
+            self.strip.show()
+            yield int(duration * 1000)
+        self._clear_strip()
+
+    def _timeout(self, ranges, duration):
+        debug("executing timeout command - red",level="DEBUG")
+        self._set_color(ranges, red)
+        self.strip.show()
+        yield int(duration * .666)
+        debug("executing timeout command - green",level="DEBUG")
+        self._set_color(ranges, green)
+        self.strip.show()
+        yield int(duration * .334)
+        debug("executing timeout command - clear",level="DEBUG")
+        self._clear_strip()
+
+    def _test(self, duration):
+        for i in range(0, self.num_pixels):
+            self.strip.set_pixel(i, red)
+            if i > 0: self.strip.set_pixel(i-1, off)
+            if i == 0: self.strip.set_pixel(self.num_pixels-1, off)
+            self.strip.show()
+            yield int(duration * 1000)
+        for x in range(0, self.num_pixels):
+            i = self.num_pixels - x
+            self.strip.set_pixel(i-1, green)
+            if i < self.num_pixels: self.strip.set_pixel(i, off)
+            if i == self.num_pixels: self.strip.set_pixel(self.num_pixels-1, off)
+            self.strip.show()
+            yield int(duration * 1000)
+        self._clear_strip()
+
+    def _rainbowchase(self, frames):
+        step = round(self.num_pixels / len(colors_rgb))
+        current_pixel = 0
+        self.strip.brightness(50)
+        for color1, color2 in zip(colors_rgb, colors_rgb[1:]):
+            self.strip.set_pixel_line_gradient(current_pixel, current_pixel + step, color1, color2)
+            current_pixel += step
+        self.strip.set_pixel_line_gradient(current_pixel, self.num_pixels - 1, violet, red)
+        for _ in range(int(frames)):
+            self.strip.rotate_right(1)
+            yield 42
+            self.strip.show()
+        self._clear_strip()
+
+    def _chase(self):
+        for i in range(0, self.num_pixels):
+            self.strip.set_pixel(i,red)
+            self.strip.show()
+            yield 100
+        self._clear_strip()
+
+class LCDRenderer:
+    def __init__(self, lcd, interval_ms=50):
+        debug("Init LCD Renderer", level="DEBUG")
+        self.lcd = lcd
+        self.interval_ms = interval_ms
+        self.deferred = False
+        self.dirty = False
+        self.last_render = time.ticks_ms()
+        self.ready = asyncio.Event()
+
+    def post(self, col, row, text):
+        """
+        Post part of a screen state. Only the LCD frame buffer is touched, so
+        posting several states before the next render collapses them into one redraw.
+        :param col: Column the text starts in.
+        :param row: Row the text is written to.
+        :param text: Text to show, clipped at the end of the row.
+        """
+        self.lcd.frame_putstr(col, row, text)
+        self._posted()
+
+    def post_clear(self):
+        """Post a blank screen state."""
+        self.lcd.frame_clear()
+        self._posted()
+
+    def _posted(self):
+        self.dirty = True
+        if self.deferred:
+            self.ready.set()
+        else:
+            # Nobody is draining the queue yet (startup), draw straight away.
+            self.render(force=True)
+
+    def render(self, force=False):
+        """
+        Draw the latest posted screen state if one is pending and at least
+        interval_ms has passed since the last redraw.
+        :param force: Draw now regardless of interval_ms.
+        :return: Number of LCD cells written.
+        """
+        if not self.dirty:
+            return 0
+        now = time.ticks_ms()
+        if not force and time.ticks_diff(now, self.last_render) < self.interval_ms:
+            return 0
+        self.dirty = False
+        self.last_render = now
+        return self.lcd.flush()
+
+    async def run(self):
+        """Render task, sleeps until a screen state is posted."""
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            wait = self.interval_ms - time.ticks_diff(time.ticks_ms(), self.last_render)
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+            self.render(force=True)
+
+# TickScheduler timer states, NO_TIMER also ends a wheel bucket chain.
+NO_TIMER = 0xff
+TIMER_ARM = 1
+TIMER_CANCEL = 2
+
+class TickScheduler:
+    def __init__(self, callbacks, tick_ms=10, slots=64):
+        """
+        Timer wheel driven by one periodic hardware timer. Every timer id owns
+        a fixed slot, so arming and cancelling never allocate.
+        :param callbacks: One callback per timer id, called with the id when it expires.
+        :param tick_ms: Resolution of the wheel in ms.
+        :param slots: Number of wheel buckets, longer delays go round more than once.
+        """
+        debug("Init Tick Scheduler", level="DEBUG")
+        self.callbacks = tuple(callbacks)
+        count = len(self.callbacks)
+        self.tick_ms = tick_ms
+        self.slots = slots
+        self.buckets = bytearray([NO_TIMER] * slots)
+        self.next = bytearray([NO_TIMER] * count)
+        self.prev = bytearray([NO_TIMER] * count)
+        self.bucket_of = bytearray([NO_TIMER] * count)
+        self.deadline = array.array("i", [0] * count)
+        # arm/cancel only leave a request here, the wheel itself is only
+        # changed from _tick so the main loop never races the timer callback.
+        self.request = array.array("i", [0] * count)
+        self.pending = bytearray(count)
+        self.cursor = 0
+        self.next_tick = time.ticks_ms()
+        # Worst arm to fire overshoot seen, should stay below one tick.
+        self.late_ms = 0
+        self.timer = None
+        self._tick_cb = self._tick
+
+    def start(self):
+        self.cursor = 0
+        self.next_tick = time.ticks_ms()
+        self.timer = Timer(period=self.tick_ms, mode=Timer.PERIODIC, callback=self._tick_cb)
+
+    def deinit(self):
+        if self.timer:
+            self.timer.deinit()
+            self.timer = None
+
+    def arm(self, timer_id, delay_ms):
+        """
+        (Re)start a timer, an already running one is moved to the new deadline.
+        :param timer_id: Index into callbacks.
+        :param delay_ms: Time until the callback runs.
+        """
+        self.request[timer_id] = time.ticks_add(time.ticks_ms(), delay_ms)
+        self.pending[timer_id] = TIMER_ARM
+
+    def cancel(self, timer_id):
+        self.pending[timer_id] = TIMER_CANCEL
+
+    def _unlink(self, timer_id):
+        bucket = self.bucket_of[timer_id]
+        if bucket == NO_TIMER:
+            return
+        prev = self.prev[timer_id]
+        nxt = self.next[timer_id]
+        if prev == NO_TIMER:
+            self.buckets[bucket] = nxt
+        else:
+            self.next[prev] = nxt
+        if nxt != NO_TIMER:
+            self.prev[nxt] = prev
+        self.bucket_of[timer_id] = NO_TIMER
+
+    def _link(self, timer_id, deadline):
+        self.deadline[timer_id] = deadline
+        # Rounded up, the bucket must not come round before the deadline or
+        # the timer waits a whole revolution for its next visit.
+        ahead = (time.ticks_diff(deadline, self.next_tick) + self.tick_ms - 1) // self.tick_ms
+        if ahead < 0:
+            ahead = 0
+        bucket = (self.cursor + ahead) % self.slots
+        head = self.buckets[bucket]
+        self.next[timer_id] = head
+        self.prev[timer_id] = NO_TIMER
+        if head != NO_TIMER:
+            self.prev[head] = timer_id
+        self.buckets[bucket] = timer_id
+        self.bucket_of[timer_id] = bucket
+
+    def _tick(self, source):
+        for timer_id in range(len(self.pending)):
+            state = self.pending[timer_id]
+            if state:
+                self.pending[timer_id] = 0
+                self._unlink(timer_id)
+                if state == TIMER_ARM:
+                    self._link(timer_id, self.request[timer_id])
+        now = time.ticks_ms()
+        # Catch up on every bucket passed since the last call, so a late
+        # callback delays expiry by at most one call and never skips it.
+        while time.ticks_diff(now, self.next_tick) >= 0:
+            timer_id = self.buckets[self.cursor]
+            while timer_id != NO_TIMER:
+                nxt = self.next[timer_id]
+                late = time.ticks_diff(now, self.deadline[timer_id])
+                if late >= 0:
+                    if late > self.late_ms:
+                        self.late_ms = late
+                    self._unlink(timer_id)
+                    self.callbacks[timer_id](timer_id)
+                timer_id = nxt
+            self.cursor += 1
+            if self.cursor == self.slots:
+                self.cursor = 0
+            self.next_tick = time.ticks_add(self.next_tick, self.tick_ms)
+
+class OutBuffer:
+    def __init__(self, size):
+        """
+        Fixed size byte ring that collects outbound messages until the writer
+        task sends them as one batch.
+        :param size: Capacity in bytes.
+        """
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, data):
+        """
+        Copy data in behind what is already queued.
+        :param data: Bytes to queue.
+        :return: False, queueing nothing, if data does not fit.
+        """
+        capacity = len(self.buf)
+        count = len(data)
+        if self.size + count > capacity:
+            return False
+        end = (self.start + self.size) % capacity
+        first = min(count, capacity - end)
+        self.mv[end:end + first] = data[:first]
+        if first < count:
+            self.mv[0:count - first] = data[first:]
+        self.size += count
+        return True
+
+    def pending(self):
+        """Longest queued run that is contiguous in the ring."""
+        return self.mv[self.start:self.start + min(self.size, len(self.buf) - self.start)]
+
+    def consume(self, count):
+        self.start = (self.start + count) % len(self.buf)
+        self.size -= count
+        if not self.size:
+            self.start = 0
+
+class LineParser:
+    def __init__(self, size, on_line):
+        """
+        Splits a received byte stream into lines inside one preallocated buffer.
+        :param size: Longest line that can be received, in bytes.
+        :param on_line: Called with a memoryview of each complete line without
+            its line ending. The view is only valid during the call.
+        """
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.on_line = on_line
+        self.on_raw = None
+        self.raw = 0
+        self.fill = 0
+        self.overflow = False
+
+    def space(self):
+        """Free end of the buffer for the next readinto."""
+        if self.fill == len(self.buf):
+            if not self.overflow:
+                debug("Line longer than {} bytes dropped",len(self.buf),level="WARNING")
+                self.overflow = True
+            self.fill = 0
+        return self.mv[self.fill:]
+
+    def feed(self, count):
+        """
+        Account for count bytes read into space() and hand every line they
+        complete to on_line, so a burst of commands is handled in one pass.
+        """
+        buf = self.buf
+        start = 0
+        fill = self.fill + count
+        i = self.fill
+        while i < fill:
+            if self.raw:
+                chunk = min(self.raw, fill - i)
+                self.raw -= chunk
+                self.on_raw(self.mv[i:i + chunk])
+                i += chunk
+                start = i
+                continue
+            if buf[i] == 10:
+                end = i
+                if end > start and buf[end - 1] == 13:
+                    end -= 1
+                if self.overflow:
+                    self.overflow = False
+                else:
+                    self.on_line(self.mv[start:end])
+                start = i + 1
+            i += 1
+        # Keep the unfinished line at the front for the next read.
+        remaining = fill - start
+        if start:
+            for i in range(remaining):
+                buf[i] = buf[start + i]
+        self.fill = remaining
+
+    def read_raw(self, count, on_raw):
+        """
+        Pass the next count bytes to on_raw as they arrive instead of
+        splitting them into lines, then carry on with lines.
+        :param count: Length of the raw payload.
+        :param on_raw: Called with a memoryview of each received chunk.
+        """
+        self.raw = count
+        self.on_raw = on_raw
+
+    def partial(self):
+        """The unfinished line received so far."""
+        return self.mv[:self.fill]
+
+    def reset(self):
+        self.fill = 0
+        self.overflow = False
+
+class Client:
+    def __init__(self, reader, writer, backlog):
+        """
+        A connected client with its own send buffer, drained by run_writer.
+        :param reader: Stream the client's commands are read from.
+        :param writer: Stream events and replies are written to.
+        :param backlog: Most bytes that may wait to be sent before the client is dropped.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.out = OutBuffer(backlog)
+        self.in_flight = 0
+        self.parser = LineParser(512, self._line)
+        self.save_date = ""
+        self.save_lines = None
+        self.binary = False
+        self.sequenced = False
+        self.frame_file = None
+        self.frame_mark = 0
+        self.closed = False
+        self.ready = asyncio.Event()
+        self.reader_task = None
+        self.writer_task = None
+
+    def send(self, data):
+        """
+        Queue data without waiting on the socket.
+        :param data: Encoded message.
+        :return: False if the client is closed or was dropped for a full backlog.
+        """
+        if self.closed:
+            return False
+        if not self.out.append(data):
+            debug("Client backlog of {} bytes full, dropping client",self.queued(),level="WARNING")
+            self.close()
+            return False
+        self.ready.set()
+        return True
+
+    def send_file(self, filename):
+        """
+        Queue a file behind everything sent so far. run_writer copies it from
+        flash in chunks, so it does not have to fit in the backlog.
+        :param filename: File to send.
+        :return: False if the client is closed or already sending a file.
+        """
+        if self.closed or self.frame_file is not None:
+            return False
+        self.frame_file = filename
+        self.frame_mark = len(self.out)
+        self.ready.set()
+        return True
+
+    def _line(self, line):
+        handleCommandLine(self, line)
+
+    def _raw(self, data):
+        receiveConfigData(self, data)
+
+    def queued(self):
+        """Bytes accepted by send that the socket has not taken yet."""
+        return len(self.out) + self.in_flight
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.reader_task and self.reader_task is not asyncio.current_task():
+            self.reader_task.cancel()
+
+    async def run_writer(self):
+        try:
+            while not self.closed:
+                await self.ready.wait()
+                self.ready.clear()
+                # Everything sent while this task waited goes out as one
+                # write. drain resumes short writes and waits out EAGAIN.
+                while (len(self.out) or self.frame_file is not None) and not self.closed:
+                    if self.frame_file is not None and not self.frame_mark:
+                        await self._write_file(self.frame_file)
+                        self.frame_file = None
+                        continue
+                    batch = self.out.pending()
+                    if self.frame_file is not None:
+                        # Only what was queued before the file goes first.
+                        batch = batch[:self.frame_mark]
+                        self.frame_mark -= len(batch)
+                    self.in_flight = len(batch)
+                    self.writer.write(batch)
+                    self.out.consume(self.in_flight)
+                    await self.writer.drain()
+                    self.in_flight = 0
+        except OSError as ex:
+            debug("{} exception in [run_writer] function: ",type(ex).__name__,level="ERROR",exc=ex)
+            self.close()
+
+    async def _write_file(self, filename):
+        chunk = bytearray(256)
+        chunkMv = memoryview(chunk)
+        with open(filename, "rb") as file:
+            while not self.closed:
+                count = file.readinto(chunk)
+                if not count:
+                    break
+                self.in_flight = count
+                self.writer.write(chunkMv[:count])
+                await self.writer.drain()
+                self.in_flight = 0
 
 def resetAll():
     global teamScore, teamGames, teamTO, lastScored, teamGameWon, teamMatchWon, newMatchReady, ballsInRack, pointsToWin, gamesToWin, isRackMode, isFoosOBSMode, isStandAloneMode, isTestMode, isMenuOn
@@ -336,22 +997,17 @@ def incrementCursor(lcd):
 
 def printLCD(lcd,col,row,line,clearRow):
     global lcdDisplayWidth
-    lcd.move_to(col,row)
-    lcd.putstr(f"{line:<{lcdDisplayWidth}}")
+    lcdRenderer.post(col,row,f"{line:<{lcdDisplayWidth}}")
 
 def printCursorLCD(lcd):
     global cursorLine, lcdDisplayWidth
-    lcd.move_to(0,cursorLine)
-    lcd.putstr("<")
-    lcd.move_to(lcdDisplayWidth-1,cursorLine)
-    lcd.putstr(">")
+    lcdRenderer.post(0,cursorLine,"<")
+    lcdRenderer.post(lcdDisplayWidth-1,cursorLine,">")
 
 def invertCursorLCD(lcd):
     global cursorLine, lcdDisplayWidth
-    lcd.move_to(0,cursorLine)
-    lcd.putstr(">")
-    lcd.move_to(lcdDisplayWidth-1,cursorLine)
-    lcd.putstr("<")
+    lcdRenderer.post(0,cursorLine,">")
+    lcdRenderer.post(lcdDisplayWidth-1,cursorLine,"<")
 
 def blink(blinks, duration):
     global skipBlinks
@@ -364,12 +1020,15 @@ def blink(blinks, duration):
             time.sleep(duration)
             blinks = blinks - 1
 
-def pinId(pin):
-#    Apparently pin has different formats depending on uf2 loaded.
-    debug("pin: {}",pin,level="DEBUG")
-    return int(''.join(filter(str.isdigit, str(pin).rstrip(",")))) 
-#    return int(str(pin)[4:6].rstrip(","))  #Pin(18, mode=IN)      pico 1 W
-#    return int(str(pin)[8:10].rstrip(",")) #Pin(GPIO16, mode=IN)  pico 2 W
+async def blinkAsync(blinks, duration):
+    if skipBlinks:
+        return
+    while blinks > 0:
+            LED.value(True)
+            await asyncio.sleep(duration)
+            LED.value(False)
+            await asyncio.sleep(duration)
+            blinks = blinks - 1
 
 def timerDone(Source):
     global isBlocked, sensorPinNbr
@@ -385,140 +1044,328 @@ def timerPBDone(x):
     debug("timerPBDone: {}",x,level="DEBUG")
 #    clearLEDStrip()
 
-def sensorInterrupt(pin):
-    global sensorStates, blockingScoreTimer, isBlocked, teamScored, sensorPinNbr, delaySensor
-    id = pinId(pin)
-    idx = pins.index(id)
-    sensorState = sensorStates[idx]
+def makePinInterrupt(slot):
+    # Each pin gets its own handler built once at start up with its slot baked
+    # in, so the interrupt needs no pin lookup and works whatever the Pin repr
+    # looks like on the loaded firmware. Runs as a hard IRQ and must not allocate,
+    # handleSensorEvent/handlePushbuttonEvent do the rest from the main loop.
+    def pinInterrupt(pin):
+        recordPinEvent(slot, pin.value(), time.ticks_us())
+    return pinInterrupt
+
+def recordPinEvent(slot, level, ticks):
+    global pinEventHead, pinEventsLost
+    head = pinEventHead
+    nextHead = head + 1
+    if nextHead == PIN_EVENT_SLOTS:
+        nextHead = 0
+    if nextHead == pinEventTail:
+        pinEventsLost += 1
+        return
+    pinEventSlot[head] = slot
+    pinEventLevel[head] = level
+    pinEventTicks[head] = ticks
+    pinEventHead = nextHead
+    pinEventFlag.set()
+
+def processPinEvents():
+    global pinEventTail, pinEventsLost
+    while pinEventTail != pinEventHead:
+        tail = pinEventTail
+        slot = pinEventSlot[tail]
+        level = pinEventLevel[tail]
+        ticks = pinEventTicks[tail]
+        tail += 1
+        if tail == PIN_EVENT_SLOTS:
+            tail = 0
+        pinEventTail = tail
+        if slot < PB_SLOT_OFFSET:
+            handleSensorEvent(slot, level, ticks)
+        else:
+            handlePushbuttonEvent(slot - PB_SLOT_OFFSET, level, ticks)
+    if pinEventsLost:
+        debug("Pin event buffer full, {} edges lost",pinEventsLost,level="WARNING")
+        pinEventsLost = 0
+
+def handleSensorEvent(idx, level, ticks):
+    global sensorStates, isBlocked, teamScored, sensorPinNbr, sensorTicks, delaySensor
     led = leds[idx]
     team = teams[idx]-1
-    for sensor in sensors:
-        sensor.irq(handler=None)
-    for pushbutton in pushbuttons:
-        pushbutton.irq(handler=None)
-    sensor = sensors[idx]
-    if (sensor.value() == onState) and (sensorStates[idx] == 0):
+    if (level == onState) and (sensorStates[idx] == 0):
         if not(isBlocked):
             sensorStates[idx] = 1
             isBlocked = True
             led.value(1)
             teamScored[team] = True
-            sensorPinNbr = id
-            debug("Sensor: {}, Team {}: On",sensorPinNbr, team+1, level="DEBUG")
-    elif (sensor.value() == offState) and (sensorStates[idx] == 1):
-        blockingScoreTimer = Timer(period = delaySensor, mode = Timer.ONE_SHOT, callback = timerDone)
+            sensorPinNbr = pins[idx]
+            sensorTicks = ticks
+            debug("Sensor: {}, Team {}: On at {}us",sensorPinNbr, team+1, ticks, level="DEBUG")
+    elif (level == offState) and (sensorStates[idx] == 1):
+        debounceScheduler.arm(SCORE_TIMER, delaySensor)
         sensorStates[idx] = 0
-    for sensor in sensors:
-        sensor.irq(handler=sensorInterrupt)
-    for pushbutton in pushbuttons:
-        pushbutton.irq(handler=pushbuttonInterrupt)
 
-def pushbuttonInterrupt(pin):
-    global teamTimeOut, pushbuttonPinNbr, isPBBlocked, delayPBTime, blockingPBTimer, timeOutWarnTimer, isMenuOn, isActionPBPressed, isTestMode
+def handlePushbuttonEvent(idx, level, ticks):
+    global teamTimeOut, pushbuttonPinNbr, pushbuttonTicks, isPBBlocked, delayPBTime, isMenuOn, isActionPBPressed, isTestMode
     if isMenuOn:
         timeDelay = delayActionPB
     else:
         timeDelay = delayPBTime
-    id = pinId(pin)
-    idx = pushbuttonPins.index(id)
     team = teams[idx]-1
-    for sensor in sensors:
-        sensor.irq(handler=None)
-    for pushbutton in pushbuttons:
-        pushbutton.irq(handler=None)
-    pushbutton = pushbuttons[idx]
     if idx == 2: #Action Button
-        if (pushbutton.value() == onPBState) and not(isPBBlocked[idx]):
+        if (level == onPBState) and not(isPBBlocked[idx]):
             isPBBlocked[idx] = True
             timeOutLED.value(1)
-            pushbuttonPinNbr = id
+            pushbuttonPinNbr = pushbuttonPins[idx]
             isActionPBPressed = True
-            blockingPBTimer[idx].deinit()
-            blockingPBTimer[idx] = Timer(period = delayActionPB, mode = Timer.ONE_SHOT, callback = lambda b: timerPBDone(idx))
+            debounceScheduler.arm(idx, delayActionPB)
             print(f"actionPB: {pushbuttonPinNbr}: On")
     else: #TimeOut Buttons
         if isTestMode:
-            blockingPBTimer[idx].deinit()
-            blockingPBTimer[idx] = Timer(period = timeDelay, mode = Timer.ONE_SHOT, callback = lambda b: timerPBDone(idx))
+            debounceScheduler.arm(idx, timeDelay)
         else:
-            if (pushbutton.value() == onPBState) and not(isPBBlocked[idx]):
+            if (level == onPBState) and not(isPBBlocked[idx]):
                 isPBBlocked[idx] = True
                 timeOutLED.value(1)
-                pushbuttonPinNbr = id
+                pushbuttonPinNbr = pushbuttonPins[idx]
+                pushbuttonTicks = ticks
                 teamTimeOut[team] = True
-                blockingPBTimer[idx].deinit()
-                blockingPBTimer[idx] = Timer(period = timeDelay, mode = Timer.ONE_SHOT, callback = lambda b: timerPBDone(idx))
+                debounceScheduler.arm(idx, timeDelay)
                 if isMenuOn:
                     debug("PB{}: {}: Pressed ",idx,pushbuttonPinNbr,level="DEBUG")
                 else:
                     debug("Team{}TO",idx+1,level="DEBUG")
-    for sensor in sensors:
-        sensor.irq(handler=sensorInterrupt)
-    for pushbutton in pushbuttons:
-        pushbutton.irq(handler=pushbuttonInterrupt)
 
-def sendMessage(c, message):
-    global isConnected
-    try:
-        displayMessage = message.replace("\r","\\r")
-        displayMessage = displayMessage.replace("\n","\\n")
-        debug("Sending: [{}]",displayMessage,level="INFO")
-        c.send(message.encode(FORMAT))
-    except Exception as ex:
-        if(type(ex).__name__=="OSError"):
-            debug("{} exception in [sendMessage] function: ",type(ex).__name__,level="ERROR",exc=ex)
-            debug("Socket disconnected.",level="INFO")
+def sendMessage(client, message):
+    displayMessage = message.replace("\r","\\r")
+    displayMessage = displayMessage.replace("\n","\\n")
+    debug("Sending: [{}]",displayMessage,level="INFO")
+    client.send(message.encode(FORMAT))
+
+def recordEvent(eventType, team, pin, ticks):
+    # Every event goes into the log, connected or not, so a client that
+    # comes back can resume from its last sequence number.
+    global eventSeq
+    eventSeq += 1
+    slot = eventSeq % EVENT_LOG_SLOTS
+    eventLogType[slot] = eventType
+    eventLogTeam[slot] = team
+    eventLogPin[slot] = pin
+    eventLogTicks[slot] = ticks
+    return eventSeq
+
+def formatEvent(seq, binary, sequenced):
+    slot = seq % EVENT_LOG_SLOTS
+    if binary:
+        struct.pack_into(EVENT_RECORD, eventRecord, 0, EVENT_MAGIC, eventLogType[slot], eventLogTeam[slot], eventLogPin[slot], seq, eventLogTicks[slot])
+        return eventRecord
+    if sequenced:
+        message = f"{eventTexts[eventLogType[slot]]}:{eventLogTeam[slot]},{eventLogPin[slot]},{seq}\r\n"
+    else:
+        message = f"{eventTexts[eventLogType[slot]]}:{eventLogTeam[slot]},{eventLogPin[slot]}\r\n"
+    return message.encode(FORMAT)
+
+def broadcastEvent(eventType, team, pin, ticks):
+    # Text clients get the FoosOBSPlus line, with the sequence number added
+    # once they have resumed, binary clients the fixed size record. Each form
+    # is built at most once and queued on every client, a slow client only
+    # fills its own backlog.
+    seq = recordEvent(eventType, team, pin, ticks)
+    if not clients:
+        return
+    debug("Sending: [{}:{},{}] seq {}",eventTexts[eventType],team,pin,seq,level="INFO")
+    record = None
+    text = None
+    sequencedText = None
+    for client in clients:
+        if client.binary:
+            if record is None:
+                record = formatEvent(seq, True, True)
+            client.send(record)
+        elif client.sequenced:
+            if sequencedText is None:
+                sequencedText = formatEvent(seq, False, True)
+            client.send(sequencedText)
         else:
-            debug("{} exception in [sendMessage] function: ",type(ex).__name__,level="ERROR",exc=ex)
-        debug("Closing socket.",level="INFO")
-        c.close()
-        isConnected = False
-
-def sendScore(c,teamAndPin):
-    sendMessage(c,f"Team:{teamAndPin}\r\n")
-
-def sendTimeOut(c,teamAndPin):
-    sendMessage(c,f"TO:{teamAndPin}\r\n")
-
-def parseSave():
-    writeDone = False
-    dateStamp = ""
-    config = ""
-    configArray = []
-    text = cmd[1].rsplit("\n")
-    for t in text:
-        debug("Received: {}",format(t),level="INFO")
-        if t != "":
-            if t[0:3] == "End":
-                debug("Got End",level="INFO")
-                if configHelper.validateConfigArray(configArray,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines):
-                    if dateStamp != "":
-                        oldConfig = configHelper.readConfigFile(CONFIGFILE)
-                        if oldConfig == config:
-                            debug("New config same as old config - write aborted.",level="WARNING")
-                        else:
-                            configHelper.writeConfigFile(oldConfig,f"{CONFIGFILE}{dateStamp}")
-                            debug("Old config backed up as {}{}.",CONFIGFILE,dateStamp,level="INFO")
-                            debug("writing config...",level="INFO")
-                            configHelper.writeConfigFile(config,CONFIGFILE)
-                    else:
-                        debug("No dateStamp found - write aborted.",level="WARNING")
-                else:
-                    debug("Invalid config - write aborted.",level="ERROR")
-            elif t[0:4] == "date":
-                dateStamp = t[7:21]
+            if text is None:
+                text = formatEvent(seq, False, False)
+            client.send(text)
+
+def replayEvents(client, lastSeq):
+    # A sequence number ahead of ours means this Pico restarted since, so
+    # everything still in the log is new to the client.
+    if lastSeq > eventSeq:
+        lastSeq = 0
+    # With nothing to replay first is always eventSeq + 1, so the reply is
+    # Resume:<last+1>,<last> (Resume:1,0 before the first event).
+    first = min(max(lastSeq + 1, eventSeq - EVENT_LOG_SLOTS + 1, 1), eventSeq + 1)
+    client.sequenced = True
+    debug("Resuming after {}, replaying {} to {}",lastSeq,first,eventSeq,level="INFO")
+    sendMessage(client,f"Resume:{first},{eventSeq}\r\n")
+    for seq in range(first, eventSeq + 1):
+        if not client.send(formatEvent(seq, client.binary, True)):
+            break
+
+def sendScore(team, pin, ticks):
+    broadcastEvent(EVENT_SCORE, team, pin, ticks)
+
+def sendTimeOut(team, pin, ticks):
+    broadcastEvent(EVENT_TIMEOUT, team, pin, ticks)
+
+def parseSaveLine(client, t):
+    debug("Received: {}",t,level="INFO")
+    if t != "":
+        if t[0:3] == "End":
+            debug("Got End",level="INFO")
+            saveConfig(client.save_date,client.save_lines)
+            client.save_lines = None
+        elif t[0:4] == "date":
+            client.save_date = t[7:21]
+        else:
+            client.save_lines.append(t.strip())
+
+def saveConfig(dateStamp, configArray):
+    if configHelper.validateConfigArray(configArray,configSchema):
+        if dateStamp != "":
+            oldConfig = configHelper.readConfigFile(CONFIGFILE)
+            if configArray == [line.strip() for line in oldConfig if line.strip() != ""]:
+                debug("New config same as old config - write aborted.",level="WARNING")
             else:
-                config = f"{config}{t.strip()}\r\n"
-                configArray.append(t.strip())
+                debug("writing config dated {}...",dateStamp,level="INFO")
+                configHelper.replaceConfigFile([f"{t}\r\n" for t in configArray],CONFIGFILE,configBackups)
+                applyConfig()
+        else:
+            debug("No dateStamp found - write aborted.",level="WARNING")
+    else:
+        debug("Invalid config - write aborted.",level="ERROR")
 
-def sendConfigFile(filename):
+def sendConfigFile(client, filename):
     config = configHelper.readConfigFile(filename)
-    sendMessage(c,"Read:\r\n")
+    sendMessage(client,"Read:\r\n")
     for line in config:
         line = f"Line:{line.rstrip()}"
         if line != "Line:":
             line = f"{line}\r\n"
-            sendMessage(c,line)
+            sendMessage(client,line)
+
+def fileCrc(filename):
+    crc = 0
+    with open(filename, "rb") as file:
+        while True:
+            count = file.readinto(configChunk)
+            if not count:
+                break
+            crc = binascii.crc32(configChunkMv[:count], crc)
+    return crc
+
+def sendConfigFrame(client, filename):
+    # Config:<length>,<crc32> then the file itself, streamed from flash by
+    # the client's writer task.
+    if client.frame_file is not None:
+        sendMessage(client,"Config:ERR,busy\r\n")
+        return
+    size = os.stat(filename)[6]
+    sendMessage(client,f"Config:{size},{fileCrc(filename):08x}\r\n")
+    client.send_file(filename)
+
+def beginConfigUpload(client, params):
+    global configUploadClient, configUploadSize, configUploadFill, configUploadCrc, configUploadExpected, configUploadDate
+    try:
+        fields = params.split(",")
+        size = int(fields[0])
+        if size < 0:
+            raise ValueError(size)
+        expected = int(fields[1], 16)
+        dateStamp = fields[2] if len(fields) > 2 else ""
+    except (ValueError, IndexError):
+        debug("Invalid putconfig: [{}]",params,level="WARNING")
+        sendMessage(client,"PutConfig:ERR,header\r\n")
+        return
+    # The payload follows the header line whether it is accepted or not,
+    # receiveConfigData skips it for a rejected upload.
+    client.parser.read_raw(size, client._raw)
+    if configUploadClient is not None:
+        sendMessage(client,"PutConfig:ERR,busy\r\n")
+    elif size > len(configUploadBuf):
+        sendMessage(client,f"PutConfig:ERR,size {len(configUploadBuf)}\r\n")
+    else:
+        debug("Receiving config, {} bytes",size,level="INFO")
+        configUploadClient = client
+        configUploadSize = size
+        configUploadFill = 0
+        configUploadCrc = 0
+        configUploadExpected = expected
+        configUploadDate = dateStamp
+        if size == 0:
+            finishConfigUpload(client)
+
+def receiveConfigData(client, data):
+    global configUploadFill, configUploadCrc
+    if configUploadClient is not client:
+        return
+    count = len(data)
+    configUploadMv[configUploadFill:configUploadFill + count] = data
+    configUploadFill += count
+    configUploadCrc = binascii.crc32(data, configUploadCrc)
+    if configUploadFill == configUploadSize:
+        finishConfigUpload(client)
+
+def finishConfigUpload(client):
+    # Nothing reaches flash until the whole payload is in RAM, matches its
+    # CRC and validates.
+    global configUploadClient
+    configUploadClient = None
+    data = configUploadMv[:configUploadSize]
+    if configUploadCrc != configUploadExpected:
+        debug("Config CRC {:08x} expected {:08x} - write aborted.",configUploadCrc,configUploadExpected,level="ERROR")
+        sendMessage(client,"PutConfig:ERR,crc\r\n")
+        return
+    configArray = str(data, FORMAT).split("\n")
+    if not configHelper.validateConfigArray(configArray,configSchema):
+        debug("Invalid config - write aborted.",level="ERROR")
+        sendMessage(client,"PutConfig:ERR,invalid\r\n")
+        return
+    if fileCrc(CONFIGFILE) == configUploadCrc:
+        debug("New config same as old config - write aborted.",level="WARNING")
+        sendMessage(client,"PutConfig:OK,unchanged\r\n")
+        return
+    debug("writing config dated {}...",configUploadDate,level="INFO")
+    configHelper.replaceConfigFile(data,CONFIGFILE,configBackups)
+    sendMessage(client,"PutConfig:OK\r\n")
+    applyConfig()
+
+def patchConfig(client, params):
+    # patch:KEY=VALUE[,KEY=VALUE...] changes just those items. The patched
+    # file is validated as a whole before it replaces config.py.
+    changes = {}
+    for change in params.split(","):
+        parts = change.split("=")
+        attribute = parts[0].strip()
+        if len(parts) != 2 or attribute == "" or parts[1].strip() == "":
+            debug("Invalid patch: [{}]",params,level="WARNING")
+            sendMessage(client,f"Patch:ERR,invalid item {change.strip()}\r\n")
+            return
+        value = parts[1].strip()
+        if configSchema["tests"].get(attribute) == "LEDS" and value[0] != '"':
+            value = f'"{value}"'
+        changes[attribute] = value
+    debug("Patching config: {}",changes,level="INFO")
+    oldConfig = configHelper.readConfigFile(CONFIGFILE)
+    config = configHelper.patchConfigArray(oldConfig,changes)
+    # Checked as strictly as validateConfigs.py does: the patch is applied
+    # live, so a duplicated pin or an LED range past the strip must not pass.
+    validated, errors = configHelper.configArrayErrors(config,configSchema)
+    errors += configHelper.configConsistencyErrors(config,configSchema)
+    if errors:
+        for error in errors:
+            debug(error,level="ERROR")
+        sendMessage(client,f"Patch:ERR,{errors[0]}\r\n")
+        return
+    if config == [line if line.endswith("\n") else f"{line}\n" for line in oldConfig]:
+        sendMessage(client,"Patch:OK,unchanged\r\n")
+        return
+    configHelper.replaceConfigFile(config,CONFIGFILE,configBackups)
+    sendMessage(client,"Patch:OK\r\n")
+    applyConfig()
 
 def clearLEDStrip():
     debug("Called clearLEDStrip.",level="DEBUG")
@@ -550,9 +1397,9 @@ def stripTimeOut(team):
     led_strip.send_command("timeout",teamsLEDRanges[team],delayPB)
 
 def testLEDs(delay):
-    led_strip.send_command("test",NUMBER_PIXELS,delay)
-    led_strip.send_command("rainbowchase",NUMBER_PIXELS,delay*300)
-    allBlink(6, .3)
+    led_strip.send_command("test",allLEDs,delay)
+    led_strip.send_command("rainbowchase",allLEDs,delay*300)
+    asyncio.create_task(allBlinkAsync(6, .3))
 
 def allBlink(blinks, duration):
     global skipBlinks
@@ -569,6 +1416,20 @@ def allBlink(blinks, duration):
             time.sleep(duration)
             blinks = blinks - 1
 
+async def allBlinkAsync(blinks, duration):
+    if skipBlinks:
+        return
+    while blinks > 0:
+            team1LED.value(True)
+            team2LED.value(True)
+            LED.value(True)
+            await asyncio.sleep(duration)
+            team1LED.value(False)
+            team2LED.value(False)
+            LED.value(False)
+            await asyncio.sleep(duration)
+            blinks = blinks - 1
+
 def sendFoosOBSPlusScreen(line,foosOBSLines):
     foosOBSLines[0] = foosOBSLines[1]
     foosOBSLines[1] = foosOBSLines[2]
@@ -581,8 +1442,7 @@ def sendFoosOBSPlusScreen(line,foosOBSLines):
 def updateFoosOBSScreen(foosOBSLines):
     x = 0
     for line in foosOBSLines:
-        lcd.move_to(0,x)
-        lcd.putstr(f"{line:<{lcdDisplayWidth}}")
+        lcdRenderer.post(0,x,f"{line:<{lcdDisplayWidth}}")
         x+=1
 
 def updateScoreScreen():
@@ -593,8 +1453,7 @@ def updateScoreScreen():
                  f"Last Scored: {lastScored}"]
         x = 0
         for line in lines:
-            lcd.move_to(0,x)
-            lcd.putstr(f"{line:<{lcdDisplayWidth}}")
+            lcdRenderer.post(0,x,f"{line:<{lcdDisplayWidth}}")
             x+=1
 
 def resetGamesScoresTOs():
@@ -608,13 +1467,12 @@ def resetGamesScoresTOs():
     newMatchReady = False
     updateScoreScreen()
     
-def handleTeamScored(c,teamNumber,foosOBSLines):
+def handleTeamScored(teamNumber,foosOBSLines):
     global teamScore,teamGames,teamGameWon,teamMatchWon,newMatchReady,lastScored,teamTO,sensorPinNbr
     teamScored[teamNumber] = False
     line = f"Team{teamNumber+1} Scored/Pin {sensorPinNbr}"
     debug(line,level="DEBUG")
-    if(isConnected):
-        sendScore(c,f"{teamNumber+1},{sensorPinNbr}")
+    sendScore(teamNumber+1,sensorPinNbr,sensorTicks)
     if not isTestMode:
         stripScore(teamNumber)
         if isStandAloneMode:
@@ -636,7 +1494,7 @@ def handleTeamScored(c,teamNumber,foosOBSLines):
             foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
     return foosOBSLines
 
-def handleTimeOut(c,teamNumber,foosOBSLines,changeValueMode):
+def handleTimeOut(teamNumber,foosOBSLines,changeValueMode):
     teamTimeOut[teamNumber] = False
     line = f"Team{teamNumber + 1} TimeOut/Pin {pushbuttonPinNbr}"
     debug(line,level="DEBUG")
@@ -652,8 +1510,7 @@ def handleTimeOut(c,teamNumber,foosOBSLines,changeValueMode):
             else:
                 incrementCursor(lcd)
     else:
-        if(isConnected):
-            sendTimeOut(c,f"{teamNumber + 1},{pushbuttonPinNbr}")
+        sendTimeOut(teamNumber + 1,pushbuttonPinNbr,pushbuttonTicks)
         if not isTestMode:
             stripTimeOut(teamNumber)
             if isStandAloneMode:
@@ -663,31 +1520,338 @@ def handleTimeOut(c,teamNumber,foosOBSLines,changeValueMode):
                 foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
     return foosOBSLines
 
-def checkSocket(s,isConnected,connectCount):
-    global c
+async def handleClient(reader, writer):
+    global connectCount, configUploadClient
+    ipAddr, ipName = writer.get_extra_info('peername')[:2]
+    if len(clients) >= maxClients:
+        debug("Refusing {} : {}, {} clients already connected",ipAddr,ipName,len(clients),level="WARNING")
+        writer.close()
+        await writer.wait_closed()
+        return
+    connectCount += 1
+    client = Client(reader, writer, clientBacklog)
+    clients.append(client)
+    debug("Connected to : {} : {}",ipAddr,ipName,level="INFO")
+    debug("Connection number: {}, clients: {}",connectCount,len(clients),level="DEBUG")
+    tempFoosOBSLines = [f"Connect on: {ipName}",f"{ipAddr}",f"Connection# {connectCount}",'']
+    updateFoosOBSScreen(tempFoosOBSLines)
+    asyncio.create_task(blinkAsync(3,.15))
+    client.reader_task = asyncio.current_task()
+    client.writer_task = asyncio.create_task(client.run_writer())
     try:
-        r, w, err = select.select((s,), (), (), .001)
-    except select.error as ex:
-        s.close()
-        isConnected = False
-        debug("connection error. Aborting..",level="ERROR",exc=ex)
-        sys.exit(1)
-    if r:
-        for readable in r:
-            c, addr = s.accept()
-            connectCount += 1
-            timeoutCount = 0
-            recvCount = 0
-            ipAddr = addr[0]
-            ipName = addr[1]
-            isConnected = True
-            debug("Connected to : {} : {}",ipAddr,ipName,level="INFO")
-            debug("Connection number: {}",connectCount,level="DEBUG")
-            tempFoosOBSLines = [f"Connect on: {ipName}",f"{ipAddr}",f"Connection# {connectCount}",'']
-            updateFoosOBSScreen(tempFoosOBSLines)
-            c.settimeout(.01)
-            blink(3,.15)
-    return s,isConnected,connectCount
+        while not client.closed:
+            count = await reader.readinto(client.parser.space())
+            if not count:
+                break
+            client.parser.feed(count)
+            partial = client.parser.partial()
+            if len(partial) and isUnterminatedCommand(client, partial):
+                handleCommandLine(client, partial)
+                client.parser.reset()
+    except Exception as ex:
+        # A failing command handler only costs this client its connection.
+        debug("{} exception in [handleClient] function: ",type(ex).__name__,level="ERROR",exc=ex)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        debug("Socket disconnected.",level="INFO")
+        client.close()
+        client.writer_task.cancel()
+        clients.remove(client)
+        if configUploadClient is client:
+            configUploadClient = None
+        debug("Closing socket.",level="INFO")
+        await writer.wait_closed()
+
+def isCommand(line, name):
+    # Compares in place so command lines never need to be copied out of the
+    # receive buffer. A command may be followed by ":" and its payload.
+    count = len(name)
+    if len(line) < count:
+        return False
+    for i in range(count):
+        if line[i] != name[i]:
+            return False
+    return len(line) == count or line[count] == 58 # ":"
+
+def handleCommandLine(client, line):
+    if client.save_lines is not None:
+        parseSaveLine(client, str(line, FORMAT))
+    elif isCommand(line, b"reset"):
+        debug("Resetting...",level="INFO")
+        machine.reset()
+    elif isCommand(line, b"read"):
+        debug("Reading config...",level="INFO")
+        sendConfigFile(client, CONFIGFILE)
+    elif isCommand(line, b"getconfig"):
+        debug("Sending config...",level="INFO")
+        sendConfigFrame(client, CONFIGFILE)
+    elif isCommand(line, b"putconfig"):
+        beginConfigUpload(client, str(line[10:], FORMAT))
+    elif isCommand(line, b"patch"):
+        patchConfig(client, str(line[6:], FORMAT))
+    elif isCommand(line, b"resume"):
+        try:
+            lastSeq = int(str(line[7:], FORMAT))
+        except ValueError:
+            debug("Invalid resume: [{}]",str(line, FORMAT),level="WARNING")
+        else:
+            replayEvents(client, lastSeq)
+    elif isCommand(line, b"binary"):
+        debug("Binary events on",level="INFO")
+        client.binary = True
+        sendMessage(client,f"Binary:{EVENT_RECORD_SIZE}\r\n")
+    elif isCommand(line, b"text"):
+        debug("Text events on",level="INFO")
+        client.binary = False
+        sendMessage(client,"Text:\r\n")
+    elif isCommand(line, b"save"):
+        debug("Saving config...",level="INFO")
+        client.save_date = ""
+        client.save_lines = []
+        if len(line) > 5:
+            parseSaveLine(client, str(line[5:], FORMAT))
+    elif len(line):
+        debug("Unknown command: [{}]",str(line, FORMAT),level="WARNING")
+
+def isUnterminatedCommand(client, line):
+    # FoosOBSPlus sends read and reset, and may end an upload, without a
+    # line ending.
+    if client.save_lines is not None:
+        return isCommand(line, b"End")
+    return isCommand(line, b"read") or isCommand(line, b"reset")
+
+def handleInputs():
+    global foosOBSLines, isActionPBPressed, isMenuOn, isTestMode, menuFirstLine, cursorLine, action
+    if teamScored[TEAM1]:
+        foosOBSLines = handleTeamScored(TEAM1,foosOBSLines)
+    elif teamScored[TEAM2]:
+        foosOBSLines = handleTeamScored(TEAM2,foosOBSLines)
+    if teamTimeOut[TEAM1]:
+        foosOBSLines = handleTimeOut(TEAM1,foosOBSLines,changeValueMode)
+    elif teamTimeOut[TEAM2]:
+        foosOBSLines = handleTimeOut(TEAM2,foosOBSLines,changeValueMode)
+    if isActionPBPressed:
+        debug("actionPBPressed!",level="INFO")
+        isActionPBPressed = False
+        if isMenuOn:
+            if changeValueMode:
+                printCursorLCD(lcd)
+            else:
+                invertCursorLCD(lcd)
+            action = menuItems[menuLevel][menuFirstLine+cursorLine]
+            debug("Action: {}",action,level="INFO")
+            handleMenuAction(action, foosOBSLines)
+        elif isTestMode:
+            isTestMode = False
+            isMenuOn = True
+            menuFirstLine = 0
+            cursorLine = 0
+            mainMenu()
+        else:
+            isMenuOn = True
+            menuFirstLine = 0
+            cursorLine = 0
+            mainMenu()
+    if isTestMode:
+        updateTestInputsScreen()
+
+def updateTestInputsScreen():
+    line = f" {sensors[0].value()}   {sensors[1].value()}   {sensors[2].value()}   {pushbuttons[0].value()}   {pushbuttons[1].value()}"
+    lcdRenderer.post(0,3,line)
+
+async def eventTask():
+    # Sleeps until an interrupt handler records a pin edge.
+    while True:
+        await pinEventFlag.wait()
+        processPinEvents()
+        handleInputs()
+
+async def gcTask():
+    # Collect garbage on a fixed schedule instead of on every LCD byte.
+    while True:
+        await asyncio.sleep_ms(gcInterval)
+        gc.collect()
+
+async def heartbeatTask():
+    activitycnt = 0
+    while True:
+        await asyncio.sleep(1)
+        print(activitycnt)
+        if debounceScheduler.late_ms > debounceScheduler.tick_ms:
+            debug("Debounce timer fired {}ms late",debounceScheduler.late_ms,level="WARNING")
+            debounceScheduler.late_ms = 0
+        activitycnt += 1
+        if activitycnt > 10000:
+            activitycnt = 0
+
+async def showHostDone():
+    await asyncio.sleep(3)
+    debug("Show Host delay done",level="DEBUG")
+    mainMenu()
+
+async def clearLEDStripAfter(delay):
+    await asyncio.sleep(delay)
+    clearLEDStrip()
+
+def parseTeamLEDs(team1LEDs, team2LEDs):
+    teamsLEDRanges = []
+    allLEDs = []
+    for teamLED in (str(team1LEDs),str(team2LEDs)):
+        ranges = []
+        groups = teamLED.split(';')
+        for group in groups:
+            start, end = group.split('-')
+            ranges.append((int(start),int(end)))
+            allLEDs.append((int(start),int(end)))
+        teamsLEDRanges.append(ranges)
+    return teamsLEDRanges, allLEDs
+
+def registerPins():
+    # (Re)create the sensor and push button pins and hook up their interrupt
+    # handlers, the slot each handler records does not change with the pin.
+    global sensors, pushbuttons
+    sensors = [Pin(p, Pin.IN) for p in pins]
+    pushbuttons = [Pin(p, Pin.IN) for p in pushbuttonPins]
+    x = 0
+    for sensor in sensors:
+        sensorStates[x] = not(sensor.value())
+        sensor.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=sensorInterrupts[x], hard=True)
+        x+=1
+    x = 0
+    for pushbutton in pushbuttons:
+        pushbutton.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=pushbuttonInterrupts[x], hard=True)
+        x+=1
+
+def unregisterPins():
+    for sensor in sensors:
+        sensor.irq(handler=None)
+    for pushbutton in pushbuttons:
+        pushbutton.irq(handler=None)
+
+def assignTeamLEDs():
+    x=0
+    for team in teams:
+        if (team == 1):
+            leds[x] = team1LED
+        else:
+            leds[x] = team2LED
+        x+=1
+
+def applyConfig():
+    # Put a newly saved config.py into effect without machine.reset, only
+    # the parts whose values changed are restarted.
+    global config, delaySensor, delayPB, delayActionPB, delayPBTime, DEBUGMODE, maxClients, clientBacklog, configBackups
+    global LED1, LED2, team1LED, team2LED, LEDSTRIP, NUMBER_PIXELS, STATE_MACHINE, port, heartbeat
+    sys.modules.pop("config", None)
+    try:
+        import config
+    except Exception as ex:
+        debug("{} exception in [applyConfig] function: ",type(ex).__name__,level="ERROR",exc=ex)
+        return
+    debug("Applying new config...",level="INFO")
+    delaySensor   = config.DELAY_SENSOR
+    delayPB       = config.DELAY_PB
+    delayActionPB = config.DELAY_ACTION_PB
+    delayPBTime   = delayPB
+    DEBUGMODE     = config.DEBUGMODE
+    maxClients    = getattr(config, "MAX_CLIENTS", 4)
+    clientBacklog = getattr(config, "CLIENT_BACKLOG", 2048)
+    configBackups = getattr(config, "CONFIG_BACKUPS", 3)
+    if DEBUGMODE and heartbeat is None:
+        heartbeat = asyncio.create_task(heartbeatTask())
+    elif not DEBUGMODE and heartbeat is not None:
+        heartbeat.cancel()
+        heartbeat = None
+    newPins = [config.SENSOR1, config.SENSOR2, config.SENSOR3]
+    newPushbuttonPins = [config.PB1, config.PB2, config.PB3]
+    if newPins != pins or newPushbuttonPins != pushbuttonPins or config.LED1 != LED1 or config.LED2 != LED2:
+        debug("Pins changed, re-registering interrupts",level="INFO")
+        unregisterPins()
+        team1LED.value(False)
+        team2LED.value(False)
+        LED1 = config.LED1
+        LED2 = config.LED2
+        team1LED = Pin(LED1,Pin.OUT)
+        team2LED = Pin(LED2,Pin.OUT)
+        assignTeamLEDs()
+        pins[:] = newPins
+        pushbuttonPins[:] = newPushbuttonPins
+        registerPins()
+    resetStrip = False
+    if (config.LEDSTRIP, config.NUMBER_PIXELS, config.STATE_MACHINE) != (LEDSTRIP, NUMBER_PIXELS, STATE_MACHINE):
+        LEDSTRIP      = config.LEDSTRIP
+        NUMBER_PIXELS = config.NUMBER_PIXELS
+        STATE_MACHINE = config.STATE_MACHINE
+        led_strip.reconfigure(LEDSTRIP,NUMBER_PIXELS,STATE_MACHINE)
+        resetStrip = True
+    newTeamsLEDRanges, newAllLEDs = parseTeamLEDs(config.TEAM1LEDS, config.TEAM2LEDS)
+    if newAllLEDs != allLEDs:
+        debug("Team LED ranges changed",level="INFO")
+        # Core 1 gets its own copies, these lists are only changed here on
+        # core 0 and stay the keys commands refer to the sets by.
+        led_strip.set_ranges(allLEDs, newAllLEDs)
+        allLEDs[:] = newAllLEDs
+        for ranges, newRanges in zip(teamsLEDRanges, newTeamsLEDRanges):
+            led_strip.set_ranges(ranges, newRanges)
+            ranges[:] = newRanges
+        resetStrip = True
+    if resetStrip:
+        clearLEDStrip()
+    if (config.SDA, config.SCL, config.I2C) != (SDA1, SCL1, I2C1):
+        debug("LCD I2C changes take effect after a reset",level="WARNING")
+    if config.PORT != port:
+        port = config.PORT
+        if not(forceStandAloneMode):
+            asyncio.create_task(restartServer())
+    debug("New config applied",level="INFO")
+
+async def restartServer():
+    global server, foosOBSLines
+    if server:
+        server.close()
+        await server.wait_closed()
+        server = None
+    try:
+        server = await asyncio.start_server(handleClient, host, port, backlog=maxClients)
+    except OSError as ex:
+        debug("{} exception in [restartServer] function: ",type(ex).__name__,level="ERROR",exc=ex)
+        foosOBSLines = sendFoosOBSPlusScreen(f"Could not bind {port}",foosOBSLines)
+        return
+    foosOBSLines = sendFoosOBSPlusScreen(f"Socket {port} bound.",foosOBSLines)
+
+async def main():
+    global foosOBSLines, server, heartbeat
+    tasks = [asyncio.create_task(eventTask()),
+             asyncio.create_task(lcdRenderer.run()),
+             asyncio.create_task(gcTask())]
+    # Started and stopped by applyConfig when DEBUGMODE changes
+    if DEBUGMODE:
+        heartbeat = asyncio.create_task(heartbeatTask())
+    if not(forceStandAloneMode):
+        try:
+            server = await asyncio.start_server(handleClient, host, port, backlog=maxClients)
+        except OSError as ex:
+            debug("{} exception in [main] function: ",type(ex).__name__,level="ERROR",exc=ex)
+            line = 'Could not bind  '
+            foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
+            line = 'aborting........'
+            foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
+            led_strip.send_command("solid",allLEDs,1,red)
+            sys.exit(1)
+        line = f"Socket {port} bound."
+        foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
+        foosOBSLines = sendFoosOBSPlusScreen("FoosOBS+Mode Active",foosOBSLines)
+    await stopEvent.wait()
+    for task in tasks:
+        task.cancel()
+    if heartbeat:
+        heartbeat.cancel()
+    for client in clients:
+        client.close()
+    if server:
+        server.close()
+        await server.wait_closed()
 
 def decrementValue():
     global menuItems,pointsToWin,maxPointsToWin,minPointsToWin
@@ -789,7 +1953,7 @@ def handleMenuAction(action, obs_lines):
         if menuLevel < 0:
             menuLevel = 0
             debug(f'Exited{action[4:]}',level="INFO")
-            lcd.clear()
+            lcdRenderer.post_clear()
             isMenuOn = False
             if isFoosOBSMode:
                 line = f'Exited{action[4:]}'
@@ -803,11 +1967,12 @@ def handleMenuAction(action, obs_lines):
     elif action == "End Program":
         debug("program ending",level="INFO")
         keepRunning = False
+        stopEvent.set()
     elif action == "Reset All":
         debug("reset All selected",level="INFO")
         resetAll()
         menuLevel = 0
-        lcd.clear()
+        lcdRenderer.post_clear()
         line = 'FoosOBS+Mode Enabled'
         foosOBSLines[0] = ''
         foosOBSLines[1] = ''
@@ -840,15 +2005,13 @@ def handleMenuAction(action, obs_lines):
         debug("Test Inputs selected",level="INFO")
         isTestMode = True
         isMenuOn = False
-        lcd.clear()
-        lcd.move_to(0,0)
-        lcd.putstr("Mode: Test Inputs")
-        lcd.move_to(0,1)
+        lcdRenderer.post_clear()
+        lcdRenderer.post(0,0,"Mode: Test Inputs")
         line = "L1  L2  L3  PB1 PB2"
-        lcd.putstr(line)
-        lcd.move_to(0,2)
+        lcdRenderer.post(0,1,line)
         line = f"P{pins[0]} P{pins[1]} P{pins[2]} P{pushbuttonPins[0]} P{pushbuttonPins[1]}"
-        lcd.putstr(line)
+        lcdRenderer.post(0,2,line)
+        updateTestInputsScreen()
     elif action == "FoosOBS+Mode":
         line = f"{action} Enabled"
         debug(line,level="INFO")
@@ -970,8 +2133,10 @@ def handleMenuAction(action, obs_lines):
         else:
             hostLine = "No IP Address"
         portLine = f"Port: {port}"
-        if isConnected:
+        if len(clients) == 1:
             connectLine = "Client Connected"
+        elif clients:
+            connectLine = f"{len(clients)} Clients Connected"
         else:
             connectLine = "No Client Connected"
         debug("connectLine {}",connectLine,level="DEBUG")
@@ -979,15 +2144,12 @@ def handleMenuAction(action, obs_lines):
         debug("portLine {}",portLine,level="DEBUG")
         tempFoosOBSLines = [connectLine,hostLine,portLine,'']
         updateFoosOBSScreen(tempFoosOBSLines)
-        time.sleep(3)
-        debug("Show Host delay done",level="DEBUG")
-        mainMenu()
+        asyncio.create_task(showHostDone())
     elif action == "Test":
         testLEDs(.1)
     elif action == "Solid":
-        led_strip.send_command("solid",allLEDs,green)
-        time.sleep(3)
-        clearLEDStrip()
+        led_strip.send_command("solid",allLEDs,1,green)
+        asyncio.create_task(clearLEDStripAfter(3))
     elif action == "Time Out Team 1":
         stripTimeOut(0)
     elif action == "Time Out Team 2":
@@ -1019,7 +2181,9 @@ resetAll()
 skipBlinks = False
 FORMAT = 'utf-8'
 LED = Pin("LED",Pin.OUT)
-isConnected = False
+clients = []
+server = None
+heartbeat = None
 CONFIGFILE = "config.py"
 REQUIREDCONFIGFILE = "requiredConfigItems.py"
 menuPtr = 0
@@ -1037,14 +2201,65 @@ cursorLine = 0 # line the cursor is on
 isPBBlocked = [False, False, False]
 isActionPBPressed = False
 sensorPinNbr = "-1"
+sensorTicks = 0
+pushbuttonTicks = 0
+# Binary event record, sent instead of the text line to clients that asked
+# for it with the binary command: magic, type, team, pin, sequence, ticks_us.
+EVENT_RECORD = "<BBBBII"
+EVENT_RECORD_SIZE = struct.calcsize(EVENT_RECORD)
+EVENT_MAGIC = 0xfe
+EVENT_SCORE = 1
+EVENT_TIMEOUT = 2
+eventTexts = {EVENT_SCORE: "Team", EVENT_TIMEOUT: "TO"}
+eventRecord = bytearray(EVENT_RECORD_SIZE)
+# Sent events by sequence number, slot seq % EVENT_LOG_SLOTS, replayed to
+# clients that reconnect with resume:<last sequence they received>.
+EVENT_LOG_SLOTS = 64
+eventLogType = bytearray(EVENT_LOG_SLOTS)
+eventLogTeam = bytearray(EVENT_LOG_SLOTS)
+eventLogPin = bytearray(EVENT_LOG_SLOTS)
+eventLogTicks = array.array("I", [0] * EVENT_LOG_SLOTS)
+eventSeq = 0
+# Single frame config transfer: getconfig replies Config:<length>,<crc32>
+# and the raw file, putconfig:<length>,<crc32>[,<date>] is followed by the
+# raw file. Uploads are collected here, one at a time.
+CONFIG_TRANSFER_MAX = 4096
+configChunk = bytearray(256)
+configChunkMv = memoryview(configChunk)
+configUploadBuf = bytearray(CONFIG_TRANSFER_MAX)
+configUploadMv = memoryview(configUploadBuf)
+configUploadClient = None
+configUploadSize = 0
+configUploadFill = 0
+configUploadCrc = 0
+configUploadExpected = 0
+configUploadDate = ""
+# Pin edges recorded by the interrupt handlers, consumed by processPinEvents.
+# Slots 0-2 are the sensors, PB_SLOT_OFFSET onwards the push buttons.
+PIN_EVENT_SLOTS = 32
+PB_SLOT_OFFSET = 3
+pinEventSlot = bytearray(PIN_EVENT_SLOTS)
+pinEventLevel = bytearray(PIN_EVENT_SLOTS)
+pinEventTicks = array.array("I", [0] * PIN_EVENT_SLOTS)
+pinEventHead = 0
+pinEventTail = 0
+pinEventsLost = 0
+pinEventFlag = asyncio.ThreadSafeFlag()
+stopEvent = asyncio.Event()
 debug("Validating configuration file...",level="INFO")
-success,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines = configHelper.loadRequired(REQUIREDCONFIGFILE)
+success,configSchema = configHelper.loadSchema(REQUIREDCONFIGFILE)
 if not success:
     debug("Invalid config file: {}",REQUIREDCONFIGFILE,level="ERROR")
     sys.exit(1)
-if not configHelper.validateConfig(configHelper.readConfigFile(CONFIGFILE),requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines):
+# config is only imported once it validates, a broken config.py is
+# replaced by the newest backup that does.
+if not configHelper.validateConfigFile(CONFIGFILE,configSchema):
     debug("Invalid config file: {}",CONFIGFILE,level="ERROR")
-    sys.exit(1)
+    if not configHelper.restoreBackup(CONFIGFILE,configSchema):
+        debug("No valid backup of {} found",CONFIGFILE,level="ERROR")
+        sys.exit(1)
+    debug("Using the last good backup of {}, the rejected file is {}.bad",CONFIGFILE,CONFIGFILE,level="WARNING")
+import config
 port          = config.PORT
 SENSOR1       = config.SENSOR1
 SENSOR2       = config.SENSOR2
@@ -1066,6 +2281,10 @@ STATE_MACHINE = config.STATE_MACHINE
 TEAM1LEDS     = config.TEAM1LEDS
 TEAM2LEDS     = config.TEAM2LEDS
 DEBUGMODE     = config.DEBUGMODE
+# Added after v2.09, older configs saved by FoosOBSPlus may not have them.
+maxClients    = getattr(config, "MAX_CLIENTS", 4)
+clientBacklog = getattr(config, "CLIENT_BACKLOG", 2048)
+configBackups = getattr(config, "CONFIG_BACKUPS", 3)
 debug("Validation successful",level="INFO")
 debug("Configuration:",level="INFO")
 for attr_name in dir(config):
@@ -1081,24 +2300,14 @@ debug("{:<20} {:<10}",f"FoosOBS+Mode On:", isFoosOBSMode)
 debug("{:<20} {:<10}",f"Stand Alone Mode On:", isStandAloneMode)
 debug("{:<20} {:<10}",f"Test Mode On:", isTestMode)
 debug("{:<20} {:<10}",f"Menu On:", isMenuOn)
-teamsLEDRanges = []
-allLEDs = []
-teamLEDs = [str(TEAM1LEDS),str(TEAM2LEDS)]
-for teamLED in teamLEDs:
-    ranges = []
-    groups = teamLED.split(';')
-    for group in groups:
-        start, end = group.split('-')
-        ranges.append((int(start),int(end)))
-        allLEDs.append((int(start),int(end)))
-    teamsLEDRanges.append(ranges)
+teamsLEDRanges, allLEDs = parseTeamLEDs(TEAM1LEDS, TEAM2LEDS)
 #set freq=400000 if start to see issues with display
 i2c = I2C(id=I2C1,scl=Pin(SCL1),sda=Pin(SDA1),freq=400000)
 lcd = I2cLcd(i2c, 0x27, 4, 20)
+lcdRenderer = LCDRenderer(lcd)
 #lcd2 = I2cLcd(i2c, 0x23, 4, 20)
 wlan = network.WLAN(network.STA_IF)
 wlan.active(True)
-isConnected = False
 forceStandAloneMode = False
 wlanCount = 0
 maxWlanCount = 1
@@ -1116,6 +2325,9 @@ while (wlan.isconnected()==False and wlanCount <= maxWlanCount and skipNetwork==
         blink(3,.25)
         time.sleep(2)
 led_strip = LEDStrip(LEDSTRIP,NUMBER_PIXELS,STATE_MACHINE,"GRB")
+led_strip.add_ranges(allLEDs)
+for ranges in teamsLEDRanges:
+    led_strip.add_ranges(ranges)
 led_strip.initialize()
 #led_strip.send_command("fast","",50)
 ####strip = Neopixel(NUMBER_PIXELS, STATE_MACHINE, LEDSTRIP, "GRB")
@@ -1127,7 +2339,6 @@ line = 'Initializing...'
 foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
 line = 'Looking for host'
 foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
-c = ""
 if (wlanCount > maxWlanCount) or skipNetwork:
     led_strip.send_command("solid",allLEDs,1,red)
     blink(4,.25)
@@ -1149,155 +2360,54 @@ if forceStandAloneMode:
     isStandAloneMode = True
     isMenuOn = False
     updateScoreScreen()
-else:
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    try:
-        s.bind((host, port))
-    except:
-        s.close()
-        try:
-            s.bind((host, port))
-        except:
-            line = 'Could not bind  '
-            foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
-            line = 'aborting........'
-            foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
-            led_strip.send_command("solid",allLEDs,1,red)
-            sys.exit(1)
-    line = f"Socket {port} bound."
-    foosOBSLines = sendFoosOBSPlusScreen(line,foosOBSLines)
-    s.listen(1)
 led_strip.send_command("solid",allLEDs,1,softgreen)
 blink(2,.15)
 team1LED = Pin(LED1,Pin.OUT)
 team2LED = Pin(LED2,Pin.OUT)
 timeOutLED = Pin("LED",Pin.OUT)
 leds = [team1LED, team2LED, team2LED]
-blockingScoreTimer = Timer(period = 1, mode = Timer.ONE_SHOT, callback = timerDone)
 delayPBTime = delayPB
-blockingPBTimer = [Timer(period = 1, mode = Timer.ONE_SHOT, callback = lambda b: timerPBDone(0)),
-                   Timer(period = 1, mode = Timer.ONE_SHOT, callback = lambda b: timerPBDone(1)),
-                   Timer(period = 1, mode = Timer.ONE_SHOT, callback = lambda b: timerPBDone(2))]
+# Debounce windows, timer ids 0-2 are the push buttons, SCORE_TIMER the sensors.
+SCORE_TIMER = 3
+debounceScheduler = TickScheduler((timerPBDone, timerPBDone, timerPBDone, timerDone))
+debounceScheduler.start()
 onState = False
 offState = True
-x = 0
-sensorStates = [0,0,0]
-pins = [SENSOR1, SENSOR2, SENSOR3]
-sensors = [Pin(p, Pin.IN) for p in pins]
-for sensor in sensors:
-    sensorStates[x] = not(sensor.value())
-    sensor.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=sensorInterrupt)
-    x+=1
 onPBState = True
 offPBState = False
-x = 0
+sensorStates = [0,0,0]
+pins = [SENSOR1, SENSOR2, SENSOR3]
 pushbuttonPins = [PB1, PB2, PB3]
-pushbuttons = [Pin(p, Pin.IN) for p in pushbuttonPins]
-for pushbutton in pushbuttons:
-    pushbutton.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=pushbuttonInterrupt)
-    x+=1
+# Pin slot lookup: slot x is sensors[x] (pins[x], teams[x], leds[x]) and slot
+# PB_SLOT_OFFSET + x is pushbuttons[x] (pushbuttonPins[x], teams[x]).
+sensorInterrupts = [makePinInterrupt(slot) for slot in range(len(pins))]
+pushbuttonInterrupts = [makePinInterrupt(PB_SLOT_OFFSET + slot) for slot in range(len(pushbuttonPins))]
+micropython.alloc_emergency_exception_buf(100)
+registerPins()
 isBlocked = False
 teamScored = [0,0]
 teamTimeOut = [0,0]
 teams = [1,2,2]
-x=0
-for team in teams:
-    if (team == 1):
-        leds[x] = team1LED
-    else:
-        leds[x] = team2LED
-    x+=1
+assignTeamLEDs()
 allBlink(3,.3)
-isConnected = False
-if not(forceStandAloneMode):
-   foosOBSLines = sendFoosOBSPlusScreen("FoosOBS+Mode Active",foosOBSLines)
 clearLEDStrip()
 connectCount = 0
-ipAddr = ''
-ipName = ''
-activitycnt = 0
-skipcnt = 0
+gcInterval = 1000 # ms between scheduled garbage collections
+# From here on screen states are only posted by the scoring code and drawn
+# by the render task, after events have been sent to FoosOBSPlus.
+lcdRenderer.deferred = True
 led_strip.send_command("rainbowchase",allLEDs,100)
-while keepRunning:
-    if DEBUGMODE:
-        if skipcnt > 1000:
-            print(activitycnt)
-            activitycnt += 1
-            if activitycnt > 10000:
-                activitycnt = 0
-            skipcnt = 0
-        skipcnt += 1
-    if teamScored[TEAM1]:
-        foosOBSLines = handleTeamScored(c,TEAM1,foosOBSLines)
-    elif teamScored[TEAM2]:
-        foosOBSLines = handleTeamScored(c,TEAM2,foosOBSLines)
-    if teamTimeOut[TEAM1]:
-        foosOBSLines = handleTimeOut(c,TEAM1,foosOBSLines,changeValueMode)
-    elif teamTimeOut[TEAM2]:
-        foosOBSLines = handleTimeOut(c,TEAM2,foosOBSLines,changeValueMode)
-    if isActionPBPressed:
-        debug("actionPBPressed!",level="INFO")
-        isActionPBPressed = False
-        if isMenuOn:
-            if changeValueMode:
-                printCursorLCD(lcd)
-            else:
-                invertCursorLCD(lcd)
-            action = menuItems[menuLevel][menuFirstLine+cursorLine]
-            debug("Action: {}",action,level="INFO")
-            handleMenuAction(action, foosOBSLines)
-        elif isTestMode:
-            isTestMode = False
-            isMenuOn = True
-            menuFirstLine = 0
-            cursorLine = 0
-            mainMenu()
-        else:
-            isMenuOn = True
-            menuFirstLine = 0
-            cursorLine = 0
-            mainMenu()
-    if isTestMode:
-        lcd.move_to(0,3)
-        line = f" {sensors[0].value()}   {sensors[1].value()}   {sensors[2].value()}   {pushbuttons[0].value()}   {pushbuttons[1].value()}"
-        lcd.putstr(line)
-    if(isConnected):
-        data = False
-        try:
-            data = c.recv(500)
-        except Exception as TimeoutException:
-            pass
-        if data:
-            raw = data.decode(FORMAT)
-            cmd = raw.rsplit(":")
-            debug("Read from socket:{}",raw,level="INFO")
-            debug("Command: [{}]",cmd[0],level="INFO")
-            if cmd[0]=="reset":
-                debug("Resetting...",level="INFO")
-                machine.reset()
-            if cmd[0]=="read":
-                debug("Reading config...",level="INFO")
-                sendConfigFile(CONFIGFILE)
-            if cmd[0]=="save":
-                debug("Saving config...",level="INFO")
-                parseSave()
-    if not(forceStandAloneMode):
-        s,isConnected,connectCount = checkSocket(s,isConnected,connectCount)
-if not(forceStandAloneMode):
-    s.close()
+# Everything below runs as tasks that sleep until there is work: pin edges
+# wake eventTask, client data wakes handleClient, posts wake the LCD renderer.
+# The LED strip already sleeps on its own command ring on core 1.
+asyncio.run(main())
+merged, dropped = led_strip.stats()
+debug("LED commands merged: {} dropped: {}",merged,dropped,level="INFO")
 team1LED.value(False)
 team2LED.value(False)
 LED.value(False)
-blockingScoreTimer.deinit()
-blockingPBTimer[0].deinit()
-blockingPBTimer[1].deinit()
-blockingPBTimer[2].deinit()
-#timeOutWarnTimer.deinit()
-for sensor in sensors:
-    sensor.irq(handler=None)
-for pushbutton in pushbuttons:
-    pushbutton.irq(handler=None)
+debounceScheduler.deinit()
+unregisterPins()
 lcd.display_off()
 lcd.backlight_off()
 debug("Sensors and Display Deactivated.",level="INFO")
\ No newline at end of file
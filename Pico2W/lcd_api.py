@@ -58,6 +58,10 @@ class LcdApi:
         self.cursor_y = 0
         self.implied_newline = False
         self.backlight = True
+        # shadow holds what is currently on the glass, frame holds what the
+        # caller wants to see there. flush() sends only the cells that differ.
+        self.shadow = bytearray(b' ' * (self.num_lines * self.num_columns))
+        self.frame = bytearray(self.shadow)
         self.display_off()
         self.backlight_on()
         self.clear()
@@ -73,6 +77,9 @@ class LcdApi:
         self.hal_write_command(self.LCD_HOME)
         self.cursor_x = 0
         self.cursor_y = 0
+        for i in range(len(self.shadow)):
+            self.shadow[i] = 0x20
+            self.frame[i] = 0x20
 
     def show_cursor(self):
         """Causes the cursor to be made visible."""
@@ -144,7 +151,12 @@ class LcdApi:
             else:
                 self.cursor_x = self.num_columns
         else:
-            self.hal_write_data(ord(char))
+            data = ord(char) & 0xff
+            self.hal_write_data(data)
+            pos = self.cursor_y * self.num_columns + self.cursor_x
+            if pos < len(self.shadow):
+                self.shadow[pos] = data
+                self.frame[pos] = data
             self.cursor_x += 1
         if self.cursor_x >= self.num_columns:
             self.cursor_x = 0
@@ -157,9 +169,87 @@ class LcdApi:
     def putstr(self, string):
         """Write the indicated string to the LCD at the current cursor
         position and advances the cursor position appropriately.
+
+        Characters up to the end of the current line are sent as a single
+        run, relying on the LCD advancing its address after every character.
+        """
+        length = len(string)
+        i = 0
+        while i < length:
+            if string[i] == '\n' or self.cursor_x >= self.num_columns:
+                self.putchar(string[i])
+                i += 1
+                continue
+            start = self.cursor_y * self.num_columns + self.cursor_x
+            end = start + self.num_columns - self.cursor_x
+            pos = start
+            while pos < end and i < length and string[i] != '\n':
+                data = ord(string[i]) & 0xff
+                self.shadow[pos] = data
+                self.frame[pos] = data
+                pos += 1
+                i += 1
+            self.hal_write_data_run(self.shadow, start, pos)
+            self.cursor_x += pos - start
+            if self.cursor_x >= self.num_columns:
+                self.cursor_x = 0
+                self.cursor_y += 1
+                self.implied_newline = True
+                if self.cursor_y >= self.num_lines:
+                    self.cursor_y = 0
+                self.move_to(self.cursor_x, self.cursor_y)
+
+    def frame_putstr(self, cursor_x, cursor_y, string):
+        """Writes the indicated string into the frame buffer starting at the
+        indicated position. Nothing is sent to the LCD until flush() is
+        called. The string is clipped at the end of the line.
+        """
+        if cursor_y >= self.num_lines:
+            return
+        pos = cursor_y * self.num_columns + cursor_x
+        end = pos + min(len(string), self.num_columns - cursor_x)
+        i = 0
+        while pos < end:
+            self.frame[pos] = ord(string[i]) & 0xff
+            pos += 1
+            i += 1
+
+    def frame_clear(self):
+        """Blanks the frame buffer. The LCD itself is only updated by the
+        next flush(), which then rewrites just the cells that were not
+        already blank.
+        """
+        for i in range(len(self.frame)):
+            self.frame[i] = 0x20
+
+    def flush(self):
+        """Sends the cells of the frame buffer that differ from what is on
+        the LCD, one cursor move per run of changed cells. Returns the
+        number of cells written.
         """
-        for char in string:
-            self.putchar(char)
+        frame = self.frame
+        shadow = self.shadow
+        columns = self.num_columns
+        written = 0
+        for row in range(self.num_lines):
+            pos = row * columns
+            end = pos + columns
+            while pos < end:
+                if frame[pos] == shadow[pos]:
+                    pos += 1
+                    continue
+                start = pos
+                while pos < end and frame[pos] != shadow[pos]:
+                    shadow[pos] = frame[pos]
+                    pos += 1
+                self.move_to(start - row * columns, row)
+                self.hal_write_data_run(shadow, start, pos)
+                written += pos - start
+                self.cursor_x = pos - row * columns
+        if self.cursor_x >= columns:
+            # The last run ended on the edge of a line, wrap like putchar does.
+            self.move_to(0, (self.cursor_y + 1) % self.num_lines)
+        return written
 
     def custom_char(self, location, charmap):
         """Write a character to one of the 8 CGRAM locations, available
@@ -203,6 +293,15 @@ class LcdApi:
         """
         raise NotImplementedError
 
+    def hal_write_data_run(self, buf, start, end):
+        """Write buf[start:end] to the LCD as consecutive data bytes.
+
+        A derived HAL class may override this to send the whole run in one
+        transfer. The default writes one byte at a time.
+        """
+        for i in range(start, end):
+            self.hal_write_data(buf[i])
+
     # This is a default implementation of hal_sleep_us which is suitable
     # for most micropython implementations. For platforms which don't
     # support `time.sleep_us()` they should provide their own implementation
@@ -65,12 +65,16 @@ class Neopixel:
     # __slots__ = [
     #    'num_leds',   # number of LEDs
     #    'pixels',     # array.array('I') of raw data for LEDs
+    #    'pixels_mv',  # memoryview of pixels, used to send it from <offset>
+    #    'offset',     # index in pixels of logical pixel 0, moved by rotate_*
     #    'mode',       # mode 'RGB' etc
     #    'W_in_mode',  # bool: is 'W' in mode
     #    'sm',         # state machine
     #    'shift',      # shift amount for each component, in a tuple for (R,B,G,W)
     #    'delay',      # delay amount
     #    'brightnessvalue', # brightness scale factor 1..255
+    #    'luts',       # dict brightness -> bytearray(256) of scaled component values
+    #    'packed',     # dict brightness -> dict rgb_w -> packed pixel value
     # ]
 
     def __init__(self, num_leds, state_machine, pin, mode="RGB", delay=0.0001):
@@ -85,6 +89,8 @@ class Neopixel:
         :param delay: [default: 0.0001] delay used for latching of leds when sending data
         """
         self.pixels = array.array("I", [0] * num_leds)
+        self.pixels_mv = memoryview(self.pixels)
+        self.offset = 0
         self.mode = mode
         self.W_in_mode = 'W' in mode
         if self.W_in_mode:
@@ -101,6 +107,8 @@ class Neopixel:
         self.num_leds = num_leds
         self.delay = delay
         self.brightnessvalue = 255
+        self.luts = {}
+        self.packed = {}
 
     def brightness(self, brightness=None):
         """
@@ -119,6 +127,54 @@ class Neopixel:
             brightness = 255
         self.brightnessvalue = brightness
 
+    def brightness_lut(self, how_bright):
+        """
+        Return the 256 entry table mapping a color component to its value scaled
+        by <how_bright>. Tables are built once per brightness and kept.
+
+        :param how_bright: Brightness on interval 1..255
+        :return: bytearray of 256 scaled component values
+        """
+        lut = self.luts.get(how_bright)
+        if lut is None:
+            if len(self.luts) >= 8:
+                self.luts.clear()
+            bratio = how_bright / 255.0
+            lut = bytearray(256)
+            for value in range(256):
+                lut[value] = round(value * bratio)
+            self.luts[how_bright] = lut
+        return lut
+
+    def pack(self, rgb_w, how_bright=None):
+        """
+        Return the raw value stored in the pixel array for color rgb_w at the given
+        brightness. Results are cached per brightness and color.
+
+        :param rgb_w: Tuple of form (r, g, b) or (r, g, b, w) representing color to be used
+        :param how_bright: [default: None] Brightness of current interval. If None, use global brightness value
+        :return: packed pixel value
+        """
+        if how_bright is None:
+            how_bright = self.brightnessvalue
+        cache = self.packed.get(how_bright)
+        if cache is None:
+            cache = {}
+            self.packed[how_bright] = cache
+        pix_value = cache.get(rgb_w)
+        if pix_value is None:
+            lut = self.brightness_lut(how_bright)
+            sh_R, sh_G, sh_B, sh_W = self.shift
+            white = 0
+            # if it's (r, g, b, w)
+            if len(rgb_w) == 4 and self.W_in_mode:
+                white = lut[rgb_w[3]]
+            pix_value = white << sh_W | lut[rgb_w[2]] << sh_B | lut[rgb_w[0]] << sh_R | lut[rgb_w[1]] << sh_G
+            if len(cache) >= 64:
+                cache.clear()
+            cache[rgb_w] = pix_value
+        return pix_value
+
     def set_pixel_line_gradient(self, pixel1, pixel2, left_rgb_w, right_rgb_w, how_bright=None):
         """
         Create a gradient with two RGB colors between "pixel1" and "pixel2" (inclusive)
@@ -178,26 +234,19 @@ class Neopixel:
         :param how_bright: [default: None] Brightness of current interval. If None, use global brightness value
         :return: None
         """
-        if how_bright is None:
-            how_bright = self.brightness()
-        sh_R, sh_G, sh_B, sh_W = self.shift
-        bratio = how_bright / 255.0
-
-        red = round(rgb_w[0] * bratio)
-        green = round(rgb_w[1] * bratio)
-        blue = round(rgb_w[2] * bratio)
-        white = 0
-        # if it's (r, g, b, w)
-        if len(rgb_w) == 4 and self.W_in_mode:
-            white = round(rgb_w[3] * bratio)
-
-        pix_value = white << sh_W | blue << sh_B | red << sh_R | green << sh_G
+        pix_value = self.pack(rgb_w, how_bright)
+        num_leds = self.num_leds
+        offset = self.offset
         # set some subset, if pixel_num is a slice:
         if type(pixel_num) is slice:
-            for i in range(*pixel_num.indices(self.num_leds)):
-                self.pixels[i] = pix_value
+            pixels = self.pixels
+            for i in range(*pixel_num.indices(num_leds)):
+                i += offset
+                if i >= num_leds:
+                    i -= num_leds
+                pixels[i] = pix_value
         else:
-            self.pixels[pixel_num] = pix_value
+            self.pixels[(pixel_num % num_leds + offset) % num_leds] = pix_value
 
     def get_pixel(self, pixel_num):
         """
@@ -206,7 +255,7 @@ class Neopixel:
         :param pixel_num: Index of pixel to be set
         :return rgb_w: Tuple of form (r, g, b) or (r, g, b, w) representing color to be used
         """
-        balance = self.pixels[pixel_num]
+        balance = self.pixels[(pixel_num % self.num_leds + self.offset) % self.num_leds]
         sh_R, sh_G, sh_B, sh_W = self.shift
         if self.W_in_mode:
             w = (balance >> sh_W) & 255
@@ -302,7 +351,8 @@ class Neopixel:
         """
         if num_of_pixels is None:
             num_of_pixels = 1
-        self.pixels = self.pixels[num_of_pixels:] + self.pixels[:num_of_pixels]
+        # Only the logical start moves, show() sends the array from there
+        self.offset = (self.offset + num_of_pixels) % self.num_leds
 
     def rotate_right(self, num_of_pixels=None):
         """
@@ -313,8 +363,7 @@ class Neopixel:
         """
         if num_of_pixels is None:
             num_of_pixels = 1
-        num_of_pixels = -1 * num_of_pixels
-        self.pixels = self.pixels[num_of_pixels:] + self.pixels[:num_of_pixels]
+        self.offset = (self.offset - num_of_pixels) % self.num_leds
 
     def show(self):
         """
@@ -326,9 +375,14 @@ class Neopixel:
         cut = 8
         if self.W_in_mode:
             cut = 0
-        sm_put = self.sm.put
-        for pixval in self.pixels:
-            sm_put(pixval, cut)
+        # StateMachine.put accepts a whole buffer and applies the shift to every
+        # word itself, so the strip is fed without a Python loop per pixel.
+        offset = self.offset
+        if offset:
+            self.sm.put(self.pixels_mv[offset:], cut)
+            self.sm.put(self.pixels_mv[:offset], cut)
+        else:
+            self.sm.put(self.pixels, cut)
         time.sleep(self.delay)
 
     def fill(self, rgb_w, how_bright=None):
@@ -348,4 +402,7 @@ class Neopixel:
 
         :return: None
         """
-        self.pixels = array.array("I", [0] * self.num_leds)
+        pixels = self.pixels
+        for i in range(self.num_leds):
+            pixels[i] = 0
+        self.offset = 0
@@ -19,7 +19,16 @@ class I2cLcd(LcdApi):
     def __init__(self, i2c, i2c_addr, num_lines, num_columns):
         self.i2c = i2c
         self.i2c_addr = i2c_addr
-        self.i2c.writeto(self.i2c_addr, bytes([0]))
+        # Scratch buffers reused for every transfer so the write path never
+        # allocates. Garbage collection is left to the caller's main loop.
+        self.byte_buf = bytearray(1)
+        self.nibble_buf = bytearray(2)
+        self.cmd_buf = bytearray(4)
+        # Room for the four nibble/enable strobes of every character on a line
+        self.run_buf = bytearray(4 * min(num_columns, 40))
+        run_mv = memoryview(self.run_buf)
+        self.run_views = tuple(run_mv[:i] for i in range(0, len(self.run_buf) + 1, 4))
+        self.i2c.writeto(self.i2c_addr, self.byte_buf)
         utime.sleep_ms(20)   # Allow LCD time to powerup
         # Send reset 3 times
         self.hal_write_init_nibble(self.LCD_FUNCTION_RESET)
@@ -42,45 +51,70 @@ class I2cLcd(LcdApi):
         # Writes an initialization nibble to the LCD.
         # This particular function is only used during initialization.
         byte = ((nibble >> 4) & 0x0f) << SHIFT_DATA
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        gc.collect()
+        self.nibble_buf[0] = byte | MASK_E
+        self.nibble_buf[1] = byte
+        self.i2c.writeto(self.i2c_addr, self.nibble_buf)
         
     def hal_backlight_on(self):
         # Allows the hal layer to turn the backlight on
-        self.i2c.writeto(self.i2c_addr, bytes([1 << SHIFT_BACKLIGHT]))
-        gc.collect()
+        self.byte_buf[0] = 1 << SHIFT_BACKLIGHT
+        self.i2c.writeto(self.i2c_addr, self.byte_buf)
         
     def hal_backlight_off(self):
         #Allows the hal layer to turn the backlight off
-        self.i2c.writeto(self.i2c_addr, bytes([0]))
-        gc.collect()
+        self.byte_buf[0] = 0
+        self.i2c.writeto(self.i2c_addr, self.byte_buf)
         
     def hal_write_command(self, cmd):
         # Write a command to the LCD. Data is latched on the falling edge of E.
-        byte = ((self.backlight << SHIFT_BACKLIGHT) |
+        high = ((self.backlight << SHIFT_BACKLIGHT) |
                 (((cmd >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        byte = ((self.backlight << SHIFT_BACKLIGHT) |
-                ((cmd & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
+        low = ((self.backlight << SHIFT_BACKLIGHT) |
+               ((cmd & 0x0f) << SHIFT_DATA))
+        self._write_nibbles(high, low)
         if cmd <= 3:
             # The home and clear commands require a worst case delay of 4.1 msec
             utime.sleep_ms(5)
-        gc.collect()
 
     def hal_write_data(self, data):
         # Write data to the LCD. Data is latched on the falling edge of E.
-        byte = (MASK_RS |
+        high = (MASK_RS |
                 (self.backlight << SHIFT_BACKLIGHT) |
                 (((data >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        byte = (MASK_RS |
-                (self.backlight << SHIFT_BACKLIGHT) |
-                ((data & 0x0f) << SHIFT_DATA))      
-        self.i2c.writeto(self.i2c_addr, bytes([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytes([byte]))
-        gc.collect()
+        low = (MASK_RS |
+               (self.backlight << SHIFT_BACKLIGHT) |
+               ((data & 0x0f) << SHIFT_DATA))
+        self._write_nibbles(high, low)
+
+    def _write_nibbles(self, high, low):
+        # Strobe both nibbles of one byte in a single transfer.
+        cmd_buf = self.cmd_buf
+        cmd_buf[0] = high | MASK_E
+        cmd_buf[1] = high
+        cmd_buf[2] = low | MASK_E
+        cmd_buf[3] = low
+        self.i2c.writeto(self.i2c_addr, cmd_buf)
+
+    def hal_write_data_run(self, buf, start, end):
+        # Write buf[start:end] to the LCD in as few I2C transfers as possible.
+        # The LCD advances its address after every character, so the strobes
+        # for a whole line are packed back to back into run_buf. At 400kHz
+        # the two bytes between one character's latch and the next cover the
+        # ~37us the controller needs to store a character.
+        run_buf = self.run_buf
+        flags = MASK_RS | (self.backlight << SHIFT_BACKLIGHT)
+        i = 0
+        for pos in range(start, end):
+            data = buf[pos]
+            high = flags | (((data >> 4) & 0x0f) << SHIFT_DATA)
+            low = flags | ((data & 0x0f) << SHIFT_DATA)
+            run_buf[i] = high | MASK_E
+            run_buf[i + 1] = high
+            run_buf[i + 2] = low | MASK_E
+            run_buf[i + 3] = low
+            i += 4
+            if i == len(run_buf):
+                self.i2c.writeto(self.i2c_addr, run_buf)
+                i = 0
+        if i:
+            self.i2c.writeto(self.i2c_addr, self.run_views[i // 4])
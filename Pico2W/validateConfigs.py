@@ -0,0 +1,101 @@
+#Copyright 2026 Hugh Garner
+#Permission is hereby granted, free of charge, to any person obtaining a copy 
+#of this software and associated documentation files (the "Software"), to deal 
+#in the Software without restriction, including without limitation the rights 
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell 
+#copies of the Software, and to permit persons to whom the Software is 
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in 
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR 
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR 
+#OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+#ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR 
+#OTHER DEALINGS IN THE SOFTWARE. 
+#v1.00 10/18/2026 Validate config.py files for many tables on the host
+
+# Runs under CPython on the host, not on the Pico:
+#   python validateConfigs.py configs/ table7/config.py --json report.json
+# Directories are searched for files named config.py (--pattern to change
+# that), so table folders holding the rest of the Pico files can be given as
+# they are. Exit status is 1 if any config is invalid.
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+
+import configHelper
+
+schema = None
+
+def initWorker(workerSchema):
+    global schema
+    schema = workerSchema
+
+def checkConfigFile(filename):
+    try:
+        configArray = configHelper.readConfigFile(filename)
+    except (OSError, UnicodeDecodeError) as e:
+        return {"file": filename, "valid": False, "errors": [f"Error: could not read file: {e}"]}
+    # Duplicated values do not stop the Pico validating, but here any error
+    # makes a config invalid.
+    try:
+        validated, errors = configHelper.configArrayErrors(configArray,schema)
+        errors += configHelper.configConsistencyErrors(configArray,schema)
+    except Exception as e:
+        # One unexpected config must not cost the report for every other file.
+        return {"file": filename, "valid": False, "errors": [f"Error: could not validate file: {type(e).__name__}: {e}"]}
+    return {"file": filename, "valid": not errors, "errors": errors}
+
+def findConfigFiles(paths,pattern="config.py"):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", pattern), recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate FoosScoreDeluxe config.py files.")
+    parser.add_argument("paths", nargs="+", help="config files or directories of config files")
+    parser.add_argument("--required", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "requiredConfigItems.py"),
+                        help="requiredConfigItems.py to validate against")
+    parser.add_argument("--json", metavar="FILE", help="write the report as JSON to FILE, - for stdout")
+    parser.add_argument("--pattern", default="config.py",
+                        help="file name pattern searched for in directories, default config.py")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes, default one per CPU")
+    args = parser.parse_args(argv)
+
+    success,requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,optionalConfigNames = configHelper.loadRequired(args.required)
+    if not success:
+        return 2
+    compiled = configHelper.compileSchema(requiredConfigNames,requiredConfigTests,validPins,validSDAs,validSCLs,validI2Cs,validStateMachines,optionalConfigNames)
+    files = findConfigFiles(args.paths,args.pattern)
+    with multiprocessing.Pool(args.jobs, initializer=initWorker, initargs=(compiled,)) as pool:
+        reports = pool.map(checkConfigFile, files, chunksize=16)
+
+    invalid = [report for report in reports if not report["valid"]]
+    if args.json == "-":
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump(reports, file, indent=2)
+        for report in invalid:
+            print(f"{report['file']}:")
+            for error in report["errors"]:
+                print(f"  {error}")
+        print(f"{len(files)} configs checked, {len(invalid)} invalid.")
+    return 1 if invalid else 0
+
+if __name__ == "__main__":
+    sys.exit(main())